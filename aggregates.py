@@ -0,0 +1,83 @@
+"""Агрегаты журнала для разделов дашборда.
+
+Статус строки кодируется один раз, дальше все итоги считаются группировками
+по целочисленным кодам без фильтрованных копий журнала.
+"""
+import numpy as np
+import pandas as pd
+
+from timeseries import DateIndex
+from vessels import VesselIndex
+
+STATUS_SHIPPED = 0
+STATUS_ON_PIER = 1
+STATUS_IN_TRANSIT = 2
+STATUS_COLUMNS = ['отгружено', 'на_причале', 'в_транзите']
+
+
+# Статусы груза: отгружен, на причале (принят, но не отгружен), в транзите
+def status_codes(df):
+    shipped = df['дата_отгрузки_авто'].notna().to_numpy()
+    arrived = df['дата_принятия_на_пирс'].notna().to_numpy()
+    return np.where(shipped, STATUS_SHIPPED,
+                    np.where(arrived, STATUS_ON_PIER, STATUS_IN_TRANSIT)).astype(np.int8)
+
+
+# Вес в журнале хранится во float32, суммы считаются во float64
+def tonnage(df):
+    return df['брутто'].to_numpy(dtype=np.float64)
+
+
+def status_totals(df, status):
+    totals = pd.Series(tonnage(df)).groupby(status).sum()
+    return totals.reindex(range(len(STATUS_COLUMNS)), fill_value=0.0).to_numpy()
+
+
+# Объёмы по клиентам: одна группировка по ключу (клиент, статус)
+def client_aggregates(df, status):
+    client_codes, clients = pd.factorize(df['клиент'], use_na_sentinel=False)
+    n_status = len(STATUS_COLUMNS)
+    key = client_codes.astype(np.int64) * n_status + status
+
+    grouped = pd.Series(tonnage(df)).groupby(key).agg(['sum', 'size'])
+    full_index = pd.RangeIndex(len(clients) * n_status)
+    sums = grouped['sum'].reindex(full_index).to_numpy().reshape(-1, n_status)
+    sizes = grouped['size'].reindex(full_index, fill_value=0).to_numpy().reshape(-1, n_status)
+
+    client_status = pd.DataFrame(np.where(np.isnan(sums), 0.0, sums), columns=STATUS_COLUMNS)
+    client_status.insert(0, 'клиент', np.asarray(clients, dtype=object))
+    client_status['всего'] = client_status['отгружено'] + client_status['на_причале'] + client_status['в_транзите']
+    client_status = client_status.sort_values('всего', ascending=False)
+
+    # Топ клиентов по отгруженному тоннажу
+    shipped = sizes[:, STATUS_SHIPPED] > 0
+    client_analysis = pd.DataFrame({
+        'клиент': np.asarray(clients, dtype=object)[shipped],
+        'общий_вес': sums[shipped, STATUS_SHIPPED],
+        'количество_мест': sizes[shipped, STATUS_SHIPPED],
+    }).sort_values('клиент').reset_index(drop=True)
+    client_analysis = client_analysis.sort_values('общий_вес', ascending=False)
+
+    return client_status, client_analysis
+
+
+# Топ клиентов с ненулевым отгруженным тоннажем
+def top_clients(client_analysis, limit=15):
+    return client_analysis[client_analysis['общий_вес'] > 0].head(limit)
+
+
+def compute_aggregates(df):
+    status = status_codes(df)
+    client_status, client_analysis = client_aggregates(df, status)
+    dates = DateIndex(df)
+    vessels = VesselIndex(df)
+    return {
+        'status': status,
+        'status_totals': status_totals(df, status),
+        'client_status': client_status,
+        'client_analysis': client_analysis,
+        'dates': dates,
+        'monthly_stats': dates.period_stats('M'),
+        'vessels': vessels,
+        'vessel_stats': vessels.stats(),
+    }
@@ -1,12 +1,19 @@
 import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, date
-import re
+from datetime import date
 import warnings
 import streamlit as st
 
+from loader import FETCH_TIMEOUT
+from refresher import BackgroundRefresher
+from storage import CACHE_PATH
+from sources import MultiSourceLedger, load_sources
+from aggregates import compute_aggregates, top_clients as select_top_clients
+from memo import SnapshotMemo, SnapshotStore, fingerprint
+from figures import (clients_figure, period_figure, today_figure, top_clients_figure,
+                     unique_clients_figure, vessels_figure, pier_stock_figure, days_histogram_figure,
+                     CATEGORY_LIMIT)
+from instrumentation import DIAGNOSTICS, MetricsSink, StageLog, profile_report, start_profiler
+
 warnings.filterwarnings('ignore')
 
 # === Streamlit UI с мобильной оптимизацией ===
@@ -28,216 +35,183 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_metrics_sink():
+    return MetricsSink()
+
+# Диагностика скрыта; её открывает YAKHROMA_DIAGNOSTICS=1 или параметр ?diagnostics=1.
+# Без диагностики и без файлов метрик замеры этапов выключены
+show_diagnostics = DIAGNOSTICS or st.query_params.get('diagnostics') == '1'
+page_log = StageLog('page', enabled=show_diagnostics or get_metrics_sink().enabled)
+profiler = start_profiler() if st.session_state.pop('profile_next_rerun', False) else None
+page_log.checkpoint('load')
+
+@st.cache_resource
+def get_refresher():
+    # Источники из реестра загружаются параллельно и сводятся в общий журнал
+    ledger = MultiSourceLedger(load_sources(), cache_path=CACHE_PATH)
+    ledger.load_cache()
+    sink = get_metrics_sink()
+
+    def record_refresh():
+        sink.record(ledger.stages, ledger_rows=len(ledger.df), ledger_memory_bytes=ledger.memory_after,
+                    changed_rows=ledger.changed_rows, rejected_values=sum(ledger.rejected.values()),
+                    failed_sources=len(ledger.errors))
+
+    return BackgroundRefresher(ledger, on_update=record_refresh).start()
+
+# Страница отдаёт последний успешный снимок и ждёт выгрузку, только пока снимка нет совсем
+def load_and_process_data():
+    refresher = get_refresher()
+    df = refresher.wait_for_snapshot(timeout=FETCH_TIMEOUT)
+    if df is None and refresher.last_error is None:
+        st.error(f"❌ Данные не загрузились за {FETCH_TIMEOUT:g} с, попробуйте обновить страницу позже")
+    elif df is None:
+        st.error(f"❌ Ошибка загрузки: {refresher.last_error}")
+    return df
+
+def format_age(age):
+    if age is None:
+        return "в неизвестное время"
+    minutes = int(age.total_seconds() // 60)
+    if minutes < 1:
+        return "только что"
+    if minutes < 60:
+        return f"{minutes} мин назад"
+    return f"{minutes // 60} ч {minutes % 60} мин назад"
+
 # Кнопка обновления данных
 col1, col2 = st.columns([3, 1])
 with col1:
     st.write("")  # Отступ
 with col2:
     if st.button("🔄 Обновить", use_container_width=True):
-        st.cache_data.clear()
-        st.success("Данные обновлены!")
-
-@st.cache_data(ttl=300)
-def load_and_process_data():
-    url = 'https://docs.google.com/spreadsheets/d/1rkmxMAb7B0RjM3PHknnkix_P5izTWyNIA3KTZvy9sWs/export?format=csv'
-    try:
-        df = pd.read_csv(url)
-        st.success("✅ Данные загружены")
-    except Exception as e:
-        st.error(f"❌ Ошибка загрузки: {e}")
-        return None
-
-    # Нормализация названий столбцов
-    def normalize_column_names(df):
-        df.columns = df.columns.str.lower().str.replace('ё', 'е').str.replace('c', 'с', regex=False)
-        df.columns = df.columns.str.strip()
-        return df
-    
-    df = normalize_column_names(df)
-
-    # Сопоставление колонок
-    required_columns = ['судно', 'дата принятия на пирс', 'дата отгрузки авто',
-                        'перевозчик', 'номер авто', 'тн', 'клиент', '№ сертиф.', 'брутто']
-    column_mapping = {}
-    
-    for req_col in required_columns:
-        matched = False
-        for avail_col in df.columns:
-            if req_col == avail_col or req_col in avail_col:
-                column_mapping[req_col] = avail_col
-                matched = True
-                break
-        if not matched:
-            column_mapping[req_col] = req_col
-
-    for standard_name, actual_name in column_mapping.items():
-        if actual_name in df.columns:
-            df[standard_name] = df[actual_name]
+        # Журнал обновится по разнице с прошлым снимком
+        if get_refresher().refresh_now(timeout=FETCH_TIMEOUT):
+            st.success("Данные обновлены!")
         else:
-            df[standard_name] = np.nan
-
-    # Преобразование дат
-    def parse_date(date_str):
-        if pd.isna(date_str) or date_str == '' or str(date_str).strip() == 'nan':
-            return pd.NaT
-        try:
-            return datetime.strptime(str(date_str).strip(), '%d.%m.%Y')
-        except:
-            try:
-                return pd.to_datetime(date_str)
-            except:
-                return pd.NaT
-
-    df['дата_принятия_на_пирс'] = df['дата принятия на пирс'].apply(parse_date)
-    df['дата_отгрузки_авто'] = df['дата отгрузки авто'].apply(parse_date)
-
-    # Преобразование чисел
-    def safe_convert_to_float(x):
-        if pd.isna(x) or x == '' or str(x).strip() == 'nan':
-            return np.nan
-        try:
-            x_str = str(x).replace(',', '.').strip()
-            return float(x_str)
-        except:
-            return np.nan
-
-    df['брутто'] = df['брутто'].apply(safe_convert_to_float)
-
-    # Преобразование текста
-    def safe_str_convert(x):
-        if pd.isna(x) or x == '' or str(x).strip() == 'nan':
-            return ''
-        return str(x).strip()
-
-    text_columns = ['судно', 'перевозчик', 'номер авто', 'тн', 'клиент', '№ сертиф.']
-    for col in text_columns:
-        if col in df.columns:
-            df[col] = df[col].apply(safe_str_convert)
+            st.warning("Обновление не завершилось, показаны последние загруженные данные")
 
-    return df
+@st.cache_resource
+def get_memo():
+    return SnapshotMemo(maxsize=128)
+
+# Журнал и производные значения общие для всех сессий; store считает, какие снимки
+# ещё показываются, и освобождает значения заменённых
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore(get_memo(), get_refresher().ledger.frames)
 
 df = load_and_process_data()
 if df is None:
     st.stop()
 
+# Состояние снимка: при медленной или неудачной выгрузке показываем последний успешный
+refresher = get_refresher()
+ledger = refresher.ledger
+if refresher.last_error is not None:
+    st.warning(f"⚠️ Не удалось обновить данные ({refresher.last_error}). "
+               f"Показан снимок, загруженный {format_age(refresher.age())}")
+elif not ledger.validated and ledger.cached_at is not None:
+    st.info(f"⏳ Показан сохранённый снимок от {ledger.cached_at:%H:%M %d.%m.%Y}, идёт проверка обновлений")
+else:
+    st.success(f"✅ Данные загружены {format_age(refresher.age())} (изменено строк: {ledger.changed_rows})")
+
+# Источники, не обновившиеся в последний раз: остальные показаны свежими
+for source_name, source_error in ledger.errors.items():
+    shown = "показан его последний снимок" if ledger.frame(source_name) is not None else "его данных на странице нет"
+    st.warning(f"⚠️ Источник «{source_name}» не обновился ({source_error}), {shown}")
+
+# Расхождения выгрузки со схемой: пропавшие необязательные колонки и неразобранные значения
+schema_report = ledger.schema_report()
+if schema_report is not None:
+    rejected_total = int(schema_report['отклонено'].sum())
+    missing_total = int(schema_report['заголовок'].isna().sum())
+    if rejected_total > 0 or missing_total > 0:
+        with st.expander(f"⚠️ Выгрузка: отклонено значений — {rejected_total}, не найдено колонок — {missing_total}"):
+            st.caption("Отклонённые даты и вес не попадают в итоги; колонки без заголовка остались пустыми")
+            st.dataframe(
+                schema_report,
+                column_config={
+                    "колонка": "Колонка",
+                    "заголовок": "В выгрузке",
+                    "отклонено": "Отклонено значений",
+                    "источник": "Источник",
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+
+# Все разделы считаются по общему журналу или по журналу одного источника
+ALL_SOURCES = "Все источники"
+selected_source = None
+if len(ledger.names) > 1:
+    source_choice = st.selectbox("Источник", [ALL_SOURCES] + ledger.names)
+    if source_choice != ALL_SOURCES:
+        selected_source = source_choice
+        df = ledger.frame(selected_source)
+        if df is None:
+            st.warning(f"Источник «{selected_source}» ещё не загружен")
+            st.stop()
+
+# Производные таблицы и графики пересчитываются только при изменении данных
+memo = get_memo()
+memo_hits, memo_misses, memo_waits = memo.hits, memo.misses, memo.waits
+snapshot = fingerprint(df)
+
+# Перезапуск арендует снимок, который показывает, и отпускает его в конце страницы.
+# Если перезапуск прервался, аренду отпустит следующий перезапуск этой сессии
+store = get_snapshot_store()
+lease = st.session_state['snapshot_lease'] = store.lease(df)
+
+# Готовая фигура хранится на снимок: Streamlit заново проверяет словарь или JSON
+# при каждом вызове, а уже проверенную фигуру только сериализует
+def plotly_chart_cached(name, build_figure):
+    fig = memo.get_or_compute(snapshot, name, build_figure)
+    st.plotly_chart(fig, use_container_width=True)
+
 # === Подготовка данных ===
 today = pd.to_datetime(date.today())
 
-# Статусы груза
-shipped = df[df['дата_отгрузки_авто'].notna()]
-on_pier = df[(df['дата_принятия_на_пирс'].notna()) & (df['дата_отгрузки_авто'].isna())]
-in_transit = df[(df['дата_принятия_на_пирс'].isna()) & (df['дата_отгрузки_авто'].isna())]
+# Статусы груза и все агрегаты считаются за один проход по журналу
+page_log.checkpoint('aggregate')
+aggregates = memo.get_or_compute(snapshot, 'aggregates', lambda: compute_aggregates(df))
+total_shipped, _, total_transit = aggregates['status_totals']
+
+# Груз на причале и сроки хранения загрузчик поддерживает по изменённым строкам
+pier = memo.get_or_compute(snapshot, 'pier', lambda: ledger.pier_snapshot(df, selected_source))
+total_on_pier, places_on_pier = pier.total()
 
 # === Ключевые метрики ===
 st.header("📈 Ключевые показатели")
+page_log.checkpoint('metrics')
 
 col1, col2, col3 = st.columns(3)
 with col1:
-    total_shipped = shipped['брутто'].sum()
     st.metric("Всего отгружено", f"{total_shipped:,.0f} т")
 with col2:
-    total_on_pier = on_pier['брутто'].sum()
     st.metric("На причале", f"{total_on_pier:,.0f} т")
 with col3:
-    total_transit = in_transit['брутто'].sum()
     st.metric("В транзите", f"{total_transit:,.0f} т")
 
 # === 1. Объёмы по клиентам (ВСЕ клиенты) ===
 st.header("👥 Объёмы по клиентам")
+page_log.checkpoint('clients')
 
-# Собираем данные по ВСЕМ клиентам
-shipped_agg = shipped.groupby('клиент')['брутто'].sum().rename('отгружено').reset_index()
-on_pier_agg = on_pier.groupby('клиент')['брутто'].sum().rename('на_причале').reset_index()
-in_transit_agg = in_transit.groupby('клиент')['брутто'].sum().rename('в_транзите').reset_index()
-
-# Объединяем все данные, включая клиентов с нулевыми значениями
-all_clients = df['клиент'].unique()
-client_status = pd.DataFrame({'клиент': all_clients})
-
-# Мерджим с агрегированными данными
-client_status = client_status.merge(shipped_agg, on='клиент', how='left') \
-    .merge(on_pier_agg, on='клиент', how='left') \
-    .merge(in_transit_agg, on='клиент', how='left') \
-    .fillna(0)
-
-client_status['всего'] = client_status['отгружено'] + client_status['на_причале'] + client_status['в_транзите']
-client_status = client_status.sort_values('всего', ascending=False)
-
-# Создаем отдельные наборы данных для каждого типа статуса (исключая нулевые значения)
-clients_with_shipped = client_status[client_status['отгружено'] > 0]
-clients_with_on_pier = client_status[client_status['на_причале'] > 0]
-clients_with_in_transit = client_status[client_status['в_транзите'] > 0]
-
-# Создаем интерактивный график с отдельными трейсами
-fig_clients = go.Figure()
-
-# Добавляем только клиентов с ненулевыми значениями для каждого статуса
-fig_clients.add_trace(go.Bar(
-    name='Отгружено', 
-    x=clients_with_shipped['клиент'], 
-    y=clients_with_shipped['отгружено'], 
-    marker_color='#FF6B6B',
-    hovertemplate='<b>%{x}</b><br>Отгружено: %{y:,.1f} т<extra></extra>'
-))
-
-fig_clients.add_trace(go.Bar(
-    name='На причале', 
-    x=clients_with_on_pier['клиент'], 
-    y=clients_with_on_pier['на_причале'], 
-    marker_color='#4ECDC4',
-    hovertemplate='<b>%{x}</b><br>На причале: %{y:,.1f} т<extra></extra>'
-))
-
-fig_clients.add_trace(go.Bar(
-    name='В транзите', 
-    x=clients_with_in_transit['клиент'], 
-    y=clients_with_in_transit['в_транзите'], 
-    marker_color='#45B7D1',
-    hovertemplate='<b>%{x}</b><br>В транзите: %{y:,.1f} т<extra></extra>'
-))
-
-fig_clients.update_layout(
-    height=500,
-    showlegend=True,
-    barmode='stack',
-    margin=dict(t=30, b=150, l=50, r=150),  # Увеличено правое поле для большой легенды
-    xaxis_tickangle=-45,
-    legend=dict(
-        orientation="v",
-        yanchor="top",
-        y=1,
-        xanchor="left",
-        x=1.05,
-        bgcolor='rgba(255,255,255,0.9)',
-        bordercolor='rgba(0,0,0,0.3)',
-        borderwidth=2,
-        font=dict(
-            size=16,  # Увеличен размер шрифта в 2 раза
-            family="Arial, sans-serif",
-            color='#2c3e50'
-        ),
-        itemwidth=40,  # Увеличена ширина элементов
-        itemdoubleclick=False,
-        groupclick="toggleitem",
-        itemsizing="constant"
-    )
-)
+# Данные по ВСЕМ клиентам, включая клиентов с нулевыми значениями
+client_status = aggregates['client_status']
 
-st.plotly_chart(fig_clients, use_container_width=True)
+plotly_chart_cached('fig_clients', lambda: clients_figure(client_status))
 
 # Информация о фильтрации
-st.info("💡 **Подсказка:** Используйте легенду справа для фильтрации данных. Клиенты с нулевыми значениями автоматически скрываются при переключении категорий.")
+st.info(f"💡 **Подсказка:** Используйте легенду над графиком для фильтрации данных. Клиенты с нулевыми значениями автоматически скрываются при переключении категорий. "
+        f"На графике — {CATEGORY_LIMIT} крупнейших клиентов, остальные объединены в «прочие».")
 
 # Таблица с детальными данными по всем клиентам
 with st.expander("📋 Детальная таблица по всем клиентам"):
-    display_table = client_status.copy()
-    display_table['отгружено'] = display_table['отгружено'].round(1)
-    display_table['на_причале'] = display_table['на_причале'].round(1)
-    display_table['в_транзите'] = display_table['в_транзите'].round(1)
-    display_table['всего'] = display_table['всего'].round(1)
-    
+    # Общая таблица без копии: округление задаёт формат колонок
     st.dataframe(
-        display_table,
+        client_status,
         column_config={
             "клиент": "Клиент",
             "отгружено": st.column_config.NumberColumn("Отгружено (т)", format="%.1f т"),
@@ -250,26 +224,20 @@ with st.expander("📋 Детальная таблица по всем клие
 
 # === 2. Отгрузка за сегодня ===
 st.header("📅 Сегодняшние отгрузки")
+page_log.checkpoint('today')
 
-shipped_today = shipped[shipped['дата_отгрузки_авто'].dt.date == today.date()]
-shipped_today_by_client = shipped_today.groupby('клиент')['брутто'].sum().reset_index()
-shipped_today_by_client = shipped_today_by_client.sort_values('брутто', ascending=False)
+# Отгрузки за день берутся из дневных свёрток индекса дат
+date_index = aggregates['dates']
+today_key = today.strftime('%Y-%m-%d')
+shipped_today_by_client = memo.get_or_compute(snapshot, f'shipped_{today_key}',
+                                               lambda: date_index.shipped_by_client(today, today))
 
 if len(shipped_today_by_client) > 0:
     # Показываем только клиентов с ненулевыми отгрузками сегодня
     active_today_clients = shipped_today_by_client[shipped_today_by_client['брутто'] > 0]
     
     if len(active_today_clients) > 0:
-        fig_today = px.bar(active_today_clients, x='клиент', y='брутто', 
-                          title=f"Отгрузки за {today.strftime('%d.%m.%Y')}",
-                          color='брутто', color_continuous_scale='Viridis')
-        fig_today.update_layout(
-            height=400, 
-            margin=dict(t=40, b=100, l=50, r=30),
-            xaxis_tickangle=-45,
-            showlegend=False
-        )
-        st.plotly_chart(fig_today, use_container_width=True)
+        plotly_chart_cached(f'fig_today_{today_key}', lambda: today_figure(active_today_clients, today))
         
         # Показать общую сумму отгрузок за сегодня
         total_today = active_today_clients['брутто'].sum()
@@ -279,171 +247,126 @@ if len(shipped_today_by_client) > 0:
 else:
     st.info("Сегодня отгрузок не было")
 
-# === 3. Помесячная статистика ===
-st.header("📆 Помесячная динамика")
-
-arrival_data = df[df['дата_принятия_на_пирс'].notna()].copy()
-arrival_data['год_месяц'] = arrival_data['дата_принятия_на_пирс'].dt.to_period('M')
-monthly_arrivals = arrival_data.groupby('год_месяц').agg({
-    'брутто': 'sum',
-    '№ сертиф.': 'count'
-}).reset_index()
-monthly_arrivals.columns = ['месяц', 'принято_тонн', 'принято_мест']
-monthly_arrivals['месяц'] = monthly_arrivals['месяц'].astype(str)
-
-shipment_data = df[df['дата_отгрузки_авто'].notna()].copy()
-shipment_data['год_месяц'] = shipment_data['дата_отгрузки_авто'].dt.to_period('M')
-monthly_shipments = shipment_data.groupby('год_месяц').agg({
-    'брутто': 'sum',
-    'клиент': 'nunique'
-}).reset_index()
-monthly_shipments.columns = ['месяц', 'отгружено_тонн', 'уникальных_клиентов']
-monthly_shipments['месяц'] = monthly_shipments['месяц'].astype(str)
-
-monthly_stats = pd.merge(monthly_arrivals, monthly_shipments, on='месяц', how='outer').fillna(0)
+# === 3. Груз на причале и сроки хранения ===
+st.header("🏗 Груз на причале")
+page_log.checkpoint('pier')
+
+percentiles = pier.dwell_percentiles()
+
+def format_days(days):
+    return "—" if days is None else f"{days} дн."
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Мест на причале", f"{places_on_pier:,}")
+with col2:
+    st.metric("Медиана хранения", format_days(percentiles[50]))
+with col3:
+    st.metric("90% отгружено за", format_days(percentiles[90]))
+
+if places_on_pier > 0:
+    tab_clients, tab_vessels = st.tabs(["По клиентам", "По судам"])
+    with tab_clients:
+        plotly_chart_cached('fig_pier_clients', lambda: pier_stock_figure(pier.stock_by_client(), 'клиент'))
+    with tab_vessels:
+        plotly_chart_cached('fig_pier_vessels', lambda: pier_stock_figure(pier.stock_by_vessel(), 'судно'))
+
+    # Возраст груза считается на сегодня по итогам принятия на пирс по дням
+    ageing_days = st.slider("Лежит на причале дольше, дней", min_value=1, max_value=180, value=30)
+    older_tonnage, older_places = pier.older_than(ageing_days, today)
+    st.caption(f"Дольше {ageing_days} дн. на причале **{older_tonnage:,.1f} т** ({older_places} мест)")
+    plotly_chart_cached(f'fig_ageing_{today_key}',
+                        lambda: days_histogram_figure(pier.ageing(today), "Возраст груза на причале", '#4ECDC4'))
+else:
+    st.info("Сейчас на причале нет груза")
+
+# Срок хранения отгруженного груза: от принятия на пирс до отгрузки авто
+plotly_chart_cached('fig_dwell', lambda: days_histogram_figure(pier.dwell_histogram(), "Срок хранения до отгрузки", '#FF6B6B'))
+st.caption("Перцентили срока хранения: " + ", ".join(f"{p}% — {format_days(days)}" for p, days in percentiles.items()))
+
+# === 4. Динамика по периодам ===
+st.header("📆 Динамика по периодам")
+page_log.checkpoint('periods')
+
+PERIODS = {'День': ('D', 'по дням'), 'Неделя': ('W', 'по неделям'), 'Месяц': ('M', 'по месяцам')}
+
+first_day, last_day = date_index.date_range()
+if first_day is not None:
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        selected_range = st.date_input("Диапазон дат", value=(first_day, last_day),
+                                       min_value=first_day, max_value=last_day, format="DD.MM.YYYY")
+    with col2:
+        period_name = st.selectbox("Период", list(PERIODS), index=2)
+
+    # Пока выбрана только начальная дата, диапазон открыт справа
+    range_start = selected_range[0] if len(selected_range) > 0 else first_day
+    range_end = selected_range[1] if len(selected_range) > 1 else last_day
+    freq, period_title = PERIODS[period_name]
+
+    monthly_stats = memo.get_or_compute(snapshot, f'stats_{freq}_{range_start}_{range_end}',
+                                        lambda: date_index.period_stats(freq, range_start, range_end))
+    arrived_in_range, _ = date_index.arrivals.total(range_start, range_end)
+    shipped_in_range, _ = date_index.shipments.total(range_start, range_end)
+    st.caption(f"За выбранный период принято **{arrived_in_range:,.1f} т**, отгружено **{shipped_in_range:,.1f} т**")
+else:
+    monthly_stats = aggregates['monthly_stats']
+    freq, period_title = PERIODS['Месяц']
+    range_start = range_end = None
+
+range_key = f'{freq}_{range_start}_{range_end}'
 
 if len(monthly_stats) > 0:
-    # График принято vs отгружено
-    fig_monthly = go.Figure()
-    fig_monthly.add_trace(go.Bar(name='Принято', x=monthly_stats['месяц'], y=monthly_stats['принято_тонн'],
-                                marker_color='#4ECDC4'))
-    fig_monthly.add_trace(go.Bar(name='Отгружено', x=monthly_stats['месяц'], y=monthly_stats['отгружено_тонн'],
-                                marker_color='#FF6B6B'))
-    
-    fig_monthly.update_layout(
-        height=400, 
-        margin=dict(t=40, b=80, l=50, r=150),  # Увеличено правое поле для большой легенды
-        xaxis_tickangle=-45,
-        barmode='group',
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1,
-            xanchor="left",
-            x=1.05,
-            bgcolor='rgba(255,255,255,0.9)',
-            bordercolor='rgba(0,0,0,0.3)',
-            borderwidth=2,
-            font=dict(
-                size=16,  # Увеличен размер шрифта в 2 раза
-                family="Arial, sans-serif",
-                color='#2c3e50'
-            ),
-            itemwidth=40,
-            itemdoubleclick=False,
-            groupclick="toggleitem",
-            itemsizing="constant"
-        )
-    )
-    st.plotly_chart(fig_monthly, use_container_width=True)
+    plotly_chart_cached(f'fig_monthly_{range_key}', lambda: period_figure(monthly_stats))
     
     # График уникальных клиентов по месяцам
-    fig_clients_monthly = px.line(monthly_stats, x='месяц', y='уникальных_клиентов',
-                                 title='Количество уникальных клиентов по месяцам',
-                                 markers=True)
-    fig_clients_monthly.update_layout(
-        height=300, 
-        margin=dict(t=40, b=50, l=50, r=30),
-        showlegend=False
-    )
-    st.plotly_chart(fig_clients_monthly, use_container_width=True)
+    plotly_chart_cached(f'fig_clients_monthly_{range_key}',
+                        lambda: unique_clients_figure(monthly_stats, period_title))
 
-# === 4. Топ клиентов по общему тоннажу ===
+# === 5. Топ клиентов по общему тоннажу ===
 st.header("🏆 Топ клиентов по общему тоннажу")
+page_log.checkpoint('top_clients')
 
-client_analysis = shipment_data.groupby('клиент').agg({
-    'брутто': 'sum',
-    '№ сертиф.': 'count'
-}).reset_index()
-client_analysis.columns = ['клиент', 'общий_вес', 'количество_мест']
-client_analysis = client_analysis.sort_values('общий_вес', ascending=False)
+client_analysis = aggregates['client_analysis']
 
 # Показываем топ-15 клиентов (только с ненулевыми значениями)
-top_clients = client_analysis[client_analysis['общий_вес'] > 0].head(15)
+top_clients = select_top_clients(client_analysis, limit=15)
 
 if len(top_clients) > 0:
-    fig_top = px.bar(top_clients, x='общий_вес', y='клиент', orientation='h',
-                    title="Топ-15 клиентов по общему тоннажу",
-                    color='общий_вес', color_continuous_scale='Blues')
-    fig_top.update_layout(
-        height=500, 
-        margin=dict(t=40, b=20, l=150, r=30),
-        showlegend=False
-    )
-    st.plotly_chart(fig_top, use_container_width=True)
+    plotly_chart_cached('fig_top', lambda: top_clients_figure(top_clients))
 else:
     st.info("Нет данных о клиентах с отгрузками")
 
-# === 5. Анализ судов ===
+# === 6. Анализ судов ===
 st.header("🚢 Анализ судов")
+page_log.checkpoint('vessels')
 
-def analyze_circular_voyages(vessel_name):
-    if pd.isna(vessel_name) or vessel_name == '':
-        return vessel_name, 0
-    vessel_str = str(vessel_name).strip()
-    pattern = r'^(.*?)\s*\((\d+)\)\s*$'
-    match = re.search(pattern, vessel_str)
-    if match:
-        base_name = match.group(1).strip()
-        voyage_number = int(match.group(2))
-        return base_name, voyage_number
-    else:
-        return vessel_str, 0
-
-arrival_data = df[df['дата_принятия_на_пирс'].notna()].copy()
-arrival_data[['базовое_название', 'номер_кругорейса']] = arrival_data['судно'].apply(
-    lambda x: pd.Series(analyze_circular_voyages(x))
-)
-
-vessel_stats = arrival_data.groupby('базовое_название').agg({
-    'дата_принятия_на_пирс': 'nunique',
-    'номер_кругорейса': 'max',
-    'брутто': 'sum'
-}).reset_index()
-vessel_stats.columns = ['судно', 'количество_заходов', 'максимальный_кругорейс', 'общий_тоннаж']
-vessel_stats = vessel_stats[vessel_stats['общий_тоннаж'] > 0].sort_values('общий_тоннаж', ascending=False).head(10)
+vessel_stats = aggregates['vessel_stats'].head(10)
 
 if len(vessel_stats) > 0:
-    fig_vessels = px.bar(vessel_stats, x='общий_тоннаж', y='судно', orientation='h',
-                        title="Топ-10 судов по тоннажу",
-                        color='количество_заходов', color_continuous_scale='Greens')
-    fig_vessels.update_layout(
-        height=400, 
-        margin=dict(t=40, b=20, l=150, r=150),  # Увеличено правое поле для большой легенды
-        showlegend=True,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1,
-            xanchor="left",
-            x=1.05,
-            bgcolor='rgba(255,255,255,0.9)',
-            bordercolor='rgba(0,0,0,0.3)',
-            borderwidth=2,
-            font=dict(
-                size=16,  # Увеличен размер шрифта в 2 раза
-                family="Arial, sans-serif",
-                color='#2c3e50'
-            ),
-            itemwidth=40,
-            itemdoubleclick=False,
-            groupclick="toggleitem",
-            itemsizing="constant",
-            title=dict(
-                text="Кол-во заходов",
-                font=dict(
-                    size=14,
-                    family="Arial, sans-serif",
-                    color='#2c3e50'
-                )
-            )
+    plotly_chart_cached('fig_vessels', lambda: vessels_figure(vessel_stats))
+
+    # История кругорейсов берётся из индекса судов без повторного прохода по журналу
+    with st.expander("🔎 Кругорейсы судна"):
+        selected_vessel = st.selectbox("Судно", aggregates['vessel_stats']['судно'])
+        st.dataframe(
+            aggregates['vessels'].voyage_history(selected_vessel).reset_index(),
+            column_config={
+                "кругорейс": "Кругорейс",
+                "заходов": "Заходов",
+                "мест": "Мест",
+                "тоннаж": st.column_config.NumberColumn("Тоннаж (т)", format="%.1f т"),
+                "первое_принятие": st.column_config.DateColumn("Первое принятие", format="DD.MM.YYYY"),
+                "последнее_принятие": st.column_config.DateColumn("Последнее принятие", format="DD.MM.YYYY"),
+            },
+            hide_index=True,
+            use_container_width=True
         )
-    )
-    st.plotly_chart(fig_vessels, use_container_width=True)
 else:
     st.info("Нет данных о судах")
 
 # === Информация ===
+page_log.checkpoint('footer')
 with st.expander("📖 Пояснение показателей"):
     st.markdown("""
     ### 📌 Пояснение показателей:
@@ -451,18 +374,85 @@ with st.expander("📖 Пояснение показателей"):
     - **Отгружено** — груз, который уже был отгружен с причала
     - **На причале** — принятый груз, который еще не отгружен  
     - **В транзите** — груз в пути к причалу
+    - **Срок хранения** — дней от принятия на пирс до отгрузки авто; **возраст груза** — дней с принятия на пирс для ещё не отгруженного груза
     
     ### 💡 Особенности отображения:
     - Клиенты с нулевыми значениями автоматически скрываются при переключении легенды
     - Это помогает сосредоточиться на активных данных
-    - Все клиенты сохраняются в детальной таблице
+    - Мелкие клиенты на графике объединяются в «прочие»; все клиенты сохраняются в детальной таблице
     
     ### 📊 Метрики:
     - **Тоннаж** измеряется в тоннах (т)
-    - **Динамика** показывает изменения по месяцам
+    - **Динамика** показывает изменения по дням, неделям или месяцам за выбранный диапазон дат
     - **Уникальные клиенты** — количество разных клиентов в месяце
     """)
 
 # Статус загрузки
-st.success(f"✅ Данные актуальны на {datetime.now().strftime('%H:%M %d.%m.%Y')}")
+loaded_at = refresher.loaded_at()
+if loaded_at is not None:
+    st.success(f"✅ Данные актуальны на {loaded_at:%H:%M %d.%m.%Y}")
 st.info(f"📊 Всего клиентов в системе: **{len(client_status)}**")
+
+# Память, занимаемая журналом после компактизации
+if ledger.memory_after is not None:
+    memory_note = f"💾 Журнал в памяти: {ledger.memory_after / 2**20:,.1f} МБ"
+    if ledger.memory_before is not None:
+        memory_note += f" (до компактизации: {ledger.memory_before / 2**20:,.1f} МБ)"
+    st.caption(memory_note)
+
+# === Диагностика ===
+page_log.finish()
+profile_text = None
+if profiler is not None:
+    profiler.disable()
+    profile_text = profile_report(profiler)
+
+get_metrics_sink().record(page_log, memo_hits_total=memo.hits, memo_misses_total=memo.misses,
+                          memo_waits_total=memo.waits,
+                          memo_entries=len(memo), snapshot_leases=store.leases,
+                          snapshots_released_total=store.released)
+
+def stage_table(log):
+    table = pd.DataFrame(log.records(), columns=['stage', 'seconds', 'calls', 'rss_delta'])
+    table['rss_delta'] = table['rss_delta'] / 2**20
+    return table
+
+STAGE_COLUMNS = {
+    "stage": "Этап",
+    "seconds": st.column_config.NumberColumn("Время (с)", format="%.3f"),
+    "calls": "Вызовов",
+    "rss_delta": st.column_config.NumberColumn("Δ RSS (МБ)", format="%.1f"),
+}
+
+if show_diagnostics:
+    with st.expander("🛠 Диагностика"):
+        st.markdown(f"**Этот перезапуск:** {page_log.total():.3f} с")
+        st.dataframe(stage_table(page_log), column_config=STAGE_COLUMNS, hide_index=True, use_container_width=True)
+
+        # Поток обновления может заменить журнал замеров во время отрисовки
+        refresh_log = ledger.stages
+        if refresh_log is not None:
+            st.markdown(f"**Последнее обновление журнала** ({refresh_log.started_at:%H:%M:%S}): "
+                        f"{refresh_log.total():.2f} с")
+            st.dataframe(stage_table(refresh_log), column_config=STAGE_COLUMNS, hide_index=True,
+                         use_container_width=True)
+            # Этапы каждого источника уже учтены в этапе 'sources'
+            for source_name, source_log in refresh_log.children.items():
+                st.markdown(f"*{source_name}:* {source_log.total():.2f} с")
+                st.dataframe(stage_table(source_log), column_config=STAGE_COLUMNS, hide_index=True,
+                             use_container_width=True)
+
+        st.markdown(f"**Кэш таблиц и графиков:** за перезапуск попаданий {memo.hits - memo_hits}, "
+                    f"промахов {memo.misses - memo_misses}, ожиданий чужого расчёта {memo.waits - memo_waits}; "
+                    f"всего {memo.hits} / {memo.misses} / {memo.waits}, записей {len(memo)}")
+        st.markdown(f"**Снимки журнала:** в кэше {len(memo.snapshots())}, аренд сессиями {store.leases}, "
+                    f"освобождено после обновлений {store.released}")
+
+        if st.button("⏱ Профилировать следующий перезапуск (cProfile)"):
+            st.session_state['profile_next_rerun'] = True
+            st.rerun()
+        if profile_text is not None:
+            st.code(profile_text)
+
+# Снимок больше не нужен этому перезапуску
+lease.release()
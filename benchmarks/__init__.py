@@ -0,0 +1 @@
+"""Замеры производительности конвейера дашборда на синтетических выгрузках."""
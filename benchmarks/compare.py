@@ -0,0 +1,71 @@
+"""Сравнение двух файлов результатов benchmarks.run.
+
+    python -m benchmarks.compare база.json новый.json --threshold 0.2
+
+Код возврата 1, если хотя бы один этап стал медленнее или прожорливее
+больше чем на threshold (доля от базы).
+"""
+import argparse
+import json
+import sys
+
+# Этапы короче этого порога слишком шумные, чтобы считать их регрессией
+MIN_SECONDS = 0.05
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report, {(row['rows'], row['stage']): row for row in report['results']}
+
+
+def ratio(new, old):
+    if new is None or old is None or old <= 0:
+        return None
+    return new / old
+
+
+def compare(base, head, threshold):
+    regressions = []
+    lines = [f"{'строк':>9} {'этап':<18} {'база, с':>9} {'новый, с':>9} {'×время':>7} {'×память':>8}"]
+    # Порядок строк — как в базовом файле: по размеру, этапы в порядке конвейера
+    for key in [key for key in base if key in head]:
+        old, new = base[key], head[key]
+        time_ratio = ratio(new['seconds'], old['seconds'])
+        memory_ratio = ratio(new['peak_bytes'], old['peak_bytes'])
+
+        flags = []
+        if time_ratio and time_ratio > 1 + threshold and new['seconds'] >= MIN_SECONDS:
+            flags.append('время')
+        if memory_ratio and memory_ratio > 1 + threshold:
+            flags.append('память')
+        if flags:
+            regressions.append((key, flags))
+
+        memory = f'{memory_ratio:8.2f}' if memory_ratio else f"{'—':>8}"
+        lines.append(f"{key[0]:>9} {key[1]:<18} {old['seconds']:9.3f} {new['seconds']:9.3f} "
+                     f"{time_ratio or 0:7.2f} {memory}" + (f"  ← {', '.join(flags)}" if flags else ''))
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    base_report, base = load_results(args.base)
+    head_report, head = load_results(args.head)
+    print(f"база: {base_report['environment']['revision']}, новый: {head_report['environment']['revision']}")
+
+    lines, regressions = compare(base, head, args.threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print(f'Регрессий: {len(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Замер времени и памяти каждого этапа конвейера дашборда.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run --sizes 1000 100000 1000000
+    python -m benchmarks.compare .cache/benchmarks/<база>.json .cache/benchmarks/<новый>.json
+
+Выгрузки генерируются один раз и кэшируются в .cache/benchmarks/data.
+Результаты пишутся в JSON: по строке на пару (размер, этап).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from aggregates import compute_aggregates
+from figures import (clients_figure, days_histogram_figure, period_figure, pier_stock_figure, today_figure,
+                     top_clients_figure, unique_clients_figure, vessels_figure)
+from inventory import PierInventory
+from loader import CHUNK_SIZE, IncrementalLedger, read_chunks
+from processing import (clean_data, compact_ledger, concat_ledger, map_columns, normalize_column_names,
+                        resolve_columns)
+from benchmarks.synthetic import ensure_ledger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, '.cache', 'benchmarks')
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+# Пиковый RSS процесса. Модуля resource нет на Windows: там пик не замеряется (None).
+# getrusage отдаёт килобайты на Linux и байты на macOS
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageTimer:
+    """Собирает время и пик выделенной памяти по этапам одного прохода."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def run(self, stage, func, *args):
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - started
+        peak = None
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.stages.append({'stage': stage, 'seconds': seconds, 'peak_bytes': peak})
+        return result
+
+
+def fetch(path, chunksize):
+    return list(read_chunks(path, chunksize=chunksize))
+
+
+def normalize(chunks):
+    chunks = [normalize_column_names(raw) for raw in chunks]
+    columns = list(chunks[0].columns)
+    mapping = resolve_columns(columns)
+    return [map_columns(raw.reset_index(drop=True), mapping) for raw in chunks], columns
+
+
+def parse(chunks):
+    return [clean_data(df) for df in chunks]
+
+
+def compact(chunks, columns):
+    return concat_ledger([compact_ledger(df, columns) for df in chunks])
+
+
+def build_pier(df):
+    inventory = PierInventory()
+    inventory.rebuild(df)
+    return inventory.snapshot()
+
+
+# Запросы, которые страница делает на каждом перезапуске: периоды, сегодняшние отгрузки, кругорейсы
+def query(aggregates):
+    dates = aggregates['dates']
+    first_day, last_day = dates.date_range()
+    results = {freq: dates.period_stats(freq, first_day, last_day) for freq in ('D', 'W', 'M')}
+    results['shipped_last_day'] = dates.shipped_by_client(last_day, last_day)
+    vessel_stats = aggregates['vessel_stats']
+    if len(vessel_stats) > 0:
+        results['voyages'] = aggregates['vessels'].voyage_history(vessel_stats['судно'].iloc[0])
+    results['last_day'] = last_day
+    return results
+
+
+# Те же графики, что строит страница, вместе с сериализацией в JSON для кэша
+def build_figures(aggregates, queried, pier):
+    client_status = aggregates['client_status']
+    client_analysis = aggregates['client_analysis']
+    shipped = queried['shipped_last_day']
+    figures = [
+        clients_figure(client_status),
+        today_figure(shipped[shipped['брутто'] > 0], pd.Timestamp(queried['last_day'] or '1970-01-01')),
+        period_figure(queried['M']),
+        unique_clients_figure(queried['M'], 'по месяцам'),
+        top_clients_figure(client_analysis[client_analysis['общий_вес'] > 0].head(15)),
+        vessels_figure(aggregates['vessel_stats'].head(10)),
+        pier_stock_figure(pier.stock_by_client().head(15), 'клиент'),
+        days_histogram_figure(pier.ageing(queried['last_day'] or '1970-01-01'), 'Возраст груза', '#4ECDC4'),
+        days_histogram_figure(pier.dwell_histogram(), 'Срок хранения', '#FF6B6B'),
+    ]
+    return [fig.to_json() for fig in figures]
+
+
+def refresh(ledger):
+    return ledger.refresh()
+
+
+def run_pipeline(path, chunksize, trace_memory=False):
+    timer = StageTimer(trace_memory)
+    chunks = timer.run('fetch', fetch, path, chunksize)
+    chunks, columns = timer.run('normalize', normalize, chunks)
+    chunks = timer.run('parse', parse, chunks)
+    df = timer.run('compact', compact, chunks, columns)
+    del chunks
+    aggregates = timer.run('aggregate', compute_aggregates, df)
+    pier = timer.run('inventory', build_pier, df)
+    queried = timer.run('query', query, aggregates)
+    timer.run('figures', build_figures, aggregates, queried, pier)
+    del df, aggregates, queried, pier
+
+    # Полный путь загрузчика: холодная загрузка и повторная сверка без изменений
+    ledger = IncrementalLedger(path, fetch=lambda url: read_chunks(url, chunksize=chunksize))
+    timer.run('refresh_cold', refresh, ledger)
+    timer.run('refresh_unchanged', refresh, ledger)
+    return timer.stages
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{revision}-dirty' if dirty else revision
+
+
+def environment():
+    return {
+        'revision': git_revision(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmarks(sizes, repeat=1, seed=0, chunksize=CHUNK_SIZE, trace_memory=True, data_dir=None, log=print):
+    data_dir = data_dir or os.path.join(BENCH_DIR, 'data')
+    results = []
+    for rows in sizes:
+        path = ensure_ledger(data_dir, rows, seed)
+        log(f'{rows:>9} строк: {path}')
+
+        # Время — лучший из повторов без трассировки памяти, пик памяти — отдельным проходом
+        runs = [run_pipeline(path, chunksize) for _ in range(repeat)]
+        peaks = run_pipeline(path, chunksize, trace_memory=True) if trace_memory else None
+
+        for i, stage in enumerate(runs[0]):
+            seconds = min(run[i]['seconds'] for run in runs)
+            result = {
+                'rows': rows,
+                'stage': stage['stage'],
+                'seconds': seconds,
+                'rows_per_second': rows / seconds if seconds > 0 else None,
+                'peak_bytes': peaks[i]['peak_bytes'] if peaks else None,
+            }
+            results.append(result)
+            peak = f"{result['peak_bytes'] / 2**20:10.1f} МБ" if peaks else ''
+            log(f"    {stage['stage']:<18} {seconds:9.3f} с {peak}")
+
+    return {
+        'environment': environment(),
+        'settings': {'repeat': repeat, 'seed': seed, 'chunksize': chunksize, 'trace_memory': trace_memory},
+        'max_rss_bytes': peak_rss(),
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='размеры выгрузок, строк (до 5000000)')
+    parser.add_argument('--repeat', type=int, default=1, help='число повторов для замера времени')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--no-memory', action='store_true', help='не делать проход с трассировкой памяти')
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--output', help='файл результатов (по умолчанию .cache/benchmarks/<ревизия>.json)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, repeat=args.repeat, seed=args.seed, chunksize=args.chunksize,
+                            trace_memory=not args.no_memory, data_dir=args.data_dir)
+
+    output = args.output or os.path.join(BENCH_DIR, f"{report['environment']['revision'] or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'Результаты: {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
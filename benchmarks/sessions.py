@@ -0,0 +1,274 @@
+"""Нагрузочный замер: много одновременных сессий страницы на одном процессе.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.sessions --rows 100000 --sessions 50 --refreshes 3
+
+Поднимает `streamlit run app.py` на синтетической выгрузке и открывает
+сессии через тот же websocket-протокол, что и браузер: волны по 1, 10, ...
+--sessions одновременных сессий, каждая делает --reruns перезапусков.
+Между повторами волны в выгрузку дописываются строки, и фоновое обновление
+заменяет снимок журнала. Конец обновления определяется по записи
+Parquet-кэша, и следующая волна идёт на непрогретый снимок: в её задержку
+входит расчёт таблиц и графиков нового снимка. После каждой волны
+записываются перцентили задержки перезапусков и RSS процесса сервера: при
+общем снимке они не должны расти ни с числом сессий, ни с числом обновлений.
+
+С --max-p95 и --max-rss-growth замер завершается с кодом 1, если p95
+задержки какой-то волны или рост RSS после обновлений превысили порог.
+
+Нужен пакет websockets (benchmarks/requirements.txt). RSS сервера читается
+из /proc/<pid>/status, то есть только на Linux; на других системах он не
+записывается, и порог --max-rss-growth проверить нельзя.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.run import BENCH_DIR, ROOT, environment
+from benchmarks.synthetic import HEADER, ensure_ledger, generate_ledger
+
+APP_PATH = os.path.join(ROOT, 'app.py')
+DEFAULT_WAVES = [1, 10, 25]
+
+
+# RSS процесса по /proc (только Linux); без /proc — None
+def server_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def format_rss(value):
+    return '      —' if value is None else f'{value / 2**20:7.1f}'
+
+
+def wait_for_server(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f'Сервер не ответил за {timeout} с')
+
+
+def start_server(port, source, cache_path, refresh_interval):
+    env = dict(os.environ,
+               YAKHROMA_SOURCE_URL=source,
+               YAKHROMA_CACHE_PATH=cache_path,
+               YAKHROMA_REFRESH_INTERVAL=str(refresh_interval))
+    env.pop('YAKHROMA_SOURCES', None)
+    env.pop('YAKHROMA_SOURCES_FILE', None)
+    command = [sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.headless', 'true',
+               '--server.port', str(port), '--browser.gatherUsageStats', 'false']
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(port)
+    except Exception:
+        server.kill()
+        raise
+    return server
+
+
+# Одна сессия: websocket-соединение и reruns перезапусков скрипта; возвращает их задержки
+async def run_session(url, reruns, query_string=''):
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    latencies = []
+    texts = []
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+        for _ in range(reruns):
+            message = BackMsg()
+            message.rerun_script.query_string = query_string
+            message.rerun_script.page_script_hash = ''
+            started = time.perf_counter()
+            await ws.send(message.SerializeToString())
+            texts = []
+            while True:
+                reply = ForwardMsg()
+                reply.ParseFromString(await ws.recv())
+                kind = reply.WhichOneof('type')
+                if kind == 'delta' and reply.delta.new_element.WhichOneof('type') == 'markdown':
+                    texts.append(reply.delta.new_element.markdown.body)
+                elif kind == 'script_finished':
+                    break
+            latencies.append(time.perf_counter() - started)
+    return latencies, texts
+
+
+async def run_wave(url, sessions, reruns):
+    results = await asyncio.gather(*(run_session(url, reruns) for _ in range(sessions)))
+    return [latency for latencies, _ in results for latency in latencies]
+
+
+# Строки диагностики страницы про кэш и снимки журнала
+def diagnostics(url):
+    _, texts = asyncio.run(run_session(url, 1, query_string='diagnostics=1'))
+    return [text for text in texts if text.startswith(('**Кэш', '**Снимки'))]
+
+
+def append_rows(path, rows, seed, part):
+    extra = generate_ledger(rows, seed=seed, part=part)
+    extra.to_csv(path, mode='a', header=False, index=False, columns=HEADER)
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Фоновое обновление закончено, когда переписан файл кэша (он пишется, только если снимок изменился)
+def wait_for_refresh(cache_path, previous, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if file_mtime(cache_path) != previous:
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f'Журнал не обновился за {timeout} с')
+
+
+def wave_result(refresh, concurrent, latencies, wall, rss):
+    latencies = np.asarray(latencies)
+    return {
+        'refresh': refresh,
+        'sessions': concurrent,
+        'reruns': len(latencies),
+        'wall_seconds': wall,
+        'reruns_per_second': len(latencies) / wall,
+        'p50_seconds': float(np.percentile(latencies, 50)),
+        'p95_seconds': float(np.percentile(latencies, 95)),
+        'p99_seconds': float(np.percentile(latencies, 99)),
+        'max_seconds': float(latencies.max()),
+        'server_rss_bytes': rss,
+    }
+
+
+# Нарушения порогов: p95 задержки любой волны и рост RSS волн после обновлений
+# относительно последней волны до них. Порог None не проверяется
+def check_thresholds(results, max_p95=None, max_rss_growth=None):
+    failures = []
+    if max_p95 is not None:
+        for result in results:
+            if result['p95_seconds'] > max_p95:
+                failures.append(f"обновление {result['refresh']}, сессий {result['sessions']}: "
+                                f"p95 {result['p95_seconds']:.3f} с > {max_p95:.3f} с")
+    before = [result for result in results if not result['refresh']]
+    after = [result for result in results if result['refresh']]
+    if max_rss_growth is not None and any(result['server_rss_bytes'] is None for result in results):
+        failures.append("RSS сервера не замерен (нужен Linux с /proc), порог роста RSS не проверен")
+    elif max_rss_growth is not None and before and after:
+        growth = max(result['server_rss_bytes'] for result in after) - before[-1]['server_rss_bytes']
+        if growth > max_rss_growth * 2**20:
+            failures.append(f"RSS после обновлений вырос на {growth / 2**20:.1f} МБ > {max_rss_growth:.1f} МБ")
+    return failures
+
+
+def run_load(rows, sessions, reruns, refreshes, refresh_rows, seed, port, refresh_interval, waves, log=print):
+    workdir = tempfile.mkdtemp(prefix='yakhroma-sessions-')
+    source = os.path.join(workdir, 'ledger.csv')
+    cache_path = os.path.join(workdir, 'ledger.parquet')
+    shutil.copyfile(ensure_ledger(os.path.join(BENCH_DIR, 'data'), rows, seed), source)
+    url = f'ws://127.0.0.1:{port}/_stcore/stream'
+
+    server = start_server(port, source, cache_path, refresh_interval)
+    results = []
+    try:
+        # Первая сессия ждёт загрузку журнала, её задержка в замер не идёт
+        asyncio.run(run_wave(url, 1, 1))
+        plan = [(0, n) for n in sorted(set(waves + [sessions]))]
+        plan += [(refresh, sessions) for refresh in range(1, refreshes + 1)]
+
+        for refresh, concurrent in plan:
+            if refresh:
+                previous = file_mtime(cache_path)
+                append_rows(source, refresh_rows, seed, part=refresh)
+                wait_for_refresh(cache_path, previous, timeout=max(60, refresh_interval * 10))
+
+            started = time.perf_counter()
+            latencies = asyncio.run(run_wave(url, concurrent, reruns))
+            result = wave_result(refresh, concurrent, latencies, time.perf_counter() - started,
+                                 server_rss(server.pid))
+            results.append(result)
+            log(f"  обновление {refresh}  сессий {concurrent:>3}  {result['reruns_per_second']:6.1f} перезапусков/с  "
+                f"p50 {result['p50_seconds']:6.3f} с  p95 {result['p95_seconds']:6.3f} с  "
+                f"p99 {result['p99_seconds']:6.3f} с  RSS {format_rss(result['server_rss_bytes'])} МБ")
+
+        notes = diagnostics(url)
+        for note in notes:
+            log(f'  {note}')
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'environment': environment(),
+        'settings': {'rows': rows, 'sessions': sessions, 'reruns': reruns, 'refreshes': refreshes,
+                     'refresh_rows': refresh_rows, 'seed': seed, 'refresh_interval': refresh_interval},
+        'diagnostics': notes,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help='строк в выгрузке')
+    parser.add_argument('--sessions', type=int, default=50, help='одновременных сессий в последней волне')
+    parser.add_argument('--waves', type=int, nargs='+', default=DEFAULT_WAVES,
+                        help='размеры промежуточных волн сессий')
+    parser.add_argument('--reruns', type=int, default=3, help='перезапусков страницы на сессию')
+    parser.add_argument('--refreshes', type=int, default=3, help='сколько раз заменить снимок журнала')
+    parser.add_argument('--refresh-rows', type=int, default=1000, help='строк, дописываемых перед обновлением')
+    parser.add_argument('--refresh-interval', type=float, default=2, help='период фонового обновления, с')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--output', help='файл результатов (по умолчанию .cache/benchmarks/sessions-<ревизия>.json)')
+    parser.add_argument('--max-p95', type=float, help='порог p95 задержки перезапуска в любой волне, с')
+    parser.add_argument('--max-rss-growth', type=float, help='порог роста RSS сервера после обновлений, МБ')
+    args = parser.parse_args(argv)
+
+    if importlib.util.find_spec('websockets') is None:
+        print('Нужен пакет websockets: pip install -r benchmarks/requirements.txt', file=sys.stderr)
+        return 1
+
+    report = run_load(args.rows, args.sessions, args.reruns, args.refreshes, args.refresh_rows, args.seed,
+                      args.port, args.refresh_interval, args.waves)
+
+    revision = report['environment']['revision'] or datetime.now().strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(BENCH_DIR, f'sessions-{revision}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'Результаты: {output}')
+
+    failures = check_thresholds(report['results'], args.max_p95, args.max_rss_growth)
+    for failure in failures:
+        print(f'Превышен порог: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
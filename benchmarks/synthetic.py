@@ -0,0 +1,149 @@
+"""Синтетическая выгрузка журнала причала для замеров производительности.
+
+Данные похожи на живую таблицу: клиенты и суда распределены неравномерно,
+у судов есть кругорейсы «Название (N)», даты встречаются в нескольких
+форматах и с мусором, вес записан с десятичной запятой, часть ячеек пустая.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+HEADER = [
+    'Судно', 'Дата принятия на пирс', 'Дата отгрузки авто', 'Перевозчик',
+    'Номер авто', 'Тн', 'Клиент', '№ Сертиф.', 'Брутто',
+]
+
+CLIENT_FORMS = ['ООО', 'АО', 'ИП', 'ЗАО']
+CLIENT_WORDS = ['Ромашка', 'Лесторг', 'Агро', 'Стройресурс', 'Нерудпром', 'Волгатранс', 'Северсталь',
+                'Металлобаза', 'Гранит', 'Щебень', 'Песок', 'Логистика', 'Терминал', 'Импорт']
+VESSEL_NAMES = ['Волгонефть', 'Сормовский', 'Нева', 'Омский', 'Волго-Дон', 'Ладога', 'СТ',
+                'Русич', 'Механик Ковтун', 'Капитан Рябцев']
+CARRIERS = ['ТК Магистраль', 'Автолайн', 'ИП Петров', 'Деловые линии', 'Самовывоз']
+LETTERS = np.array(list('АВЕКМНОРСТУХ'))
+
+# Доля непарсящихся значений и значений в других форматах
+BAD_DATES = ['31.02.2024', 'мусор', '2023/05/06', 'nan', '1.1.23', '-']
+BAD_WEIGHTS = ['abc', '1_000', 'inf', '1.234,5', 'nan', '-3', '1e3', '—']
+
+
+def make_clients(count, rng):
+    forms = rng.choice(CLIENT_FORMS, count)
+    words = rng.choice(CLIENT_WORDS, count)
+    return np.array([f'{form} {word}-{i}' for i, (form, word) in enumerate(zip(forms, words))], dtype=object)
+
+
+# Суда с номерами кругорейсов: «Волгонефть (1)», «Волгонефть (2)», ...
+def make_vessels(count, rng):
+    names = []
+    for i in range(count):
+        base = f'{VESSEL_NAMES[i % len(VESSEL_NAMES)]}-{i // len(VESSEL_NAMES) + 1}'
+        names.extend(f'{base} ({voyage})' if voyage else base for voyage in range(rng.integers(1, 8)))
+    return np.array(names, dtype=object)
+
+
+# Госномера вида «А123ВС»: одни и те же машины приезжают много раз
+def make_plates(count, rng):
+    letters = rng.choice(LETTERS, (count, 3))
+    digits = rng.integers(0, 1000, count)
+    return np.array([f'{a}{d:03d}{b}{c}' for (a, b, c), d in zip(letters, digits)], dtype=object)
+
+
+# Вероятности по закону Ципфа: несколько крупных клиентов и длинный хвост
+def zipf_weights(count, exponent=1.1):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _choice(rng, values, n, weights=None):
+    return values[rng.choice(len(values), n, p=weights)]
+
+
+def _format_dates(days, rng, blank_share):
+    n = len(days)
+    timestamps = pd.to_datetime(days)
+    formatted = timestamps.strftime('%d.%m.%Y').to_numpy(dtype=object)
+
+    kind = rng.random(n)
+    iso = (kind >= 0.90) & (kind < 0.93)
+    formatted[iso] = timestamps[iso].strftime('%Y-%m-%d')
+    short = (kind >= 0.93) & (kind < 0.95)
+    formatted[short] = [f'{t.day}.{t.month}.{t.year}' for t in timestamps[short]]
+    spaced = (kind >= 0.95) & (kind < 0.96)
+    formatted[spaced] = ' ' + formatted[spaced] + ' '
+    bad = (kind >= 0.96) & (kind < 0.965)
+    formatted[bad] = rng.choice(BAD_DATES, bad.sum())
+
+    formatted[rng.random(n) < blank_share] = ''
+    return formatted
+
+
+def _format_weights(n, rng):
+    weights = rng.gamma(2.0, 6.0, n)
+    formatted = np.array([f'{weight:.3f}'.replace('.', ',') for weight in weights], dtype=object)
+
+    kind = rng.random(n)
+    formatted[kind < 0.05] = ''
+    bad = (kind >= 0.05) & (kind < 0.06)
+    formatted[bad] = rng.choice(BAD_WEIGHTS, bad.sum())
+    return formatted
+
+
+def generate_ledger(n, seed=0, part=0, clients=300, vessels=60, trucks=2000, start='2021-01-01', days=1500):
+    """Сырая выгрузка из n строк со всеми колонками в виде текста.
+
+    Справочники клиентов и судов зависят только от seed, строки — от
+    (seed, part), поэтому части одной большой выгрузки согласованы.
+    """
+    catalog_rng = np.random.default_rng(seed)
+    client_names = make_clients(clients, catalog_rng)
+    vessel_names = make_vessels(vessels, catalog_rng)
+    plate_numbers = make_plates(trucks, catalog_rng)
+    rng = np.random.default_rng([seed, part])
+
+    # Груз сначала принимают на пирс, потом отгружают; часть ещё на пирсе или в пути
+    start = np.datetime64(start, 'D')
+    arrival = start + rng.integers(0, days, n).astype('timedelta64[D]')
+    dwell = rng.geometric(0.08, n).astype('timedelta64[D]')
+    shipment = arrival + dwell
+
+    arrival_text = _format_dates(arrival, rng, blank_share=0.05)
+    shipment_text = _format_dates(shipment, rng, blank_share=0.15)
+
+    return pd.DataFrame({
+        'Судно': _choice(rng, vessel_names, n, zipf_weights(len(vessel_names), 0.8)),
+        'Дата принятия на пирс': arrival_text,
+        'Дата отгрузки авто': shipment_text,
+        'Перевозчик': _choice(rng, np.array(CARRIERS + [''], dtype=object), n),
+        'Номер авто': _choice(rng, plate_numbers, n),
+        'Тн': _choice(rng, np.array(['20', '20,5', '25', ''], dtype=object), n),
+        'Клиент': _choice(rng, client_names, n, zipf_weights(clients)),
+        '№ Сертиф.': np.arange(1, n + 1).astype(str).astype(object),
+        'Брутто': _format_weights(n, rng),
+    }, columns=HEADER)
+
+
+# Большие выгрузки пишутся частями, чтобы генератор сам не упирался в память
+def write_ledger(path, n, seed=0, chunk_size=500_000, **kwargs):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    written = 0
+    part = 0
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+        while written < n or part == 0:
+            size = min(chunk_size, n - written)
+            chunk = generate_ledger(size, seed=seed, part=part, **kwargs)
+            chunk['№ Сертиф.'] = np.arange(written + 1, written + size + 1).astype(str)
+            chunk.to_csv(out, index=False, header=part == 0)
+            written += size
+            part += 1
+    os.replace(tmp_path, path)
+    return path
+
+
+# Выгрузка кэшируется на диске по размеру и seed, повторные замеры её не генерируют
+def ensure_ledger(directory, n, seed=0):
+    path = os.path.join(directory, f'ledger_{n}_{seed}.csv')
+    if not os.path.exists(path):
+        write_ledger(path, n, seed)
+    return path
@@ -0,0 +1,178 @@
+"""Графики дашборда, построенные из готовых агрегатов.
+
+Фигуры собираются напрямую через graph_objects из массивов агрегатов,
+без plotly.express. Оформление общее (TEMPLATE): в каждую фигуру попадает
+только компактный шаблон вместо стандартного, а легенда стоит над
+графиком, чтобы не отнимать ширину на телефоне. Длинный хвост категорий
+складывается в «прочие».
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+OTHERS_LABEL = 'прочие'
+OTHERS_COLOR = '#b0b7bf'
+
+# Столбцов на графиках по клиентам и судам; остальные складываются в «прочие»
+CATEGORY_LIMIT = 20
+
+# Начиная с этого числа точек линии рисуются через WebGL
+WEBGL_THRESHOLD = 1000
+
+FONT_FAMILY = "Arial, sans-serif"
+TEXT_COLOR = '#2c3e50'
+
+TEMPLATE = go.layout.Template(layout=dict(
+    font=dict(family=FONT_FAMILY, color=TEXT_COLOR),
+    title=dict(font=dict(size=16)),
+    legend=dict(
+        orientation="h",
+        yanchor="bottom",
+        y=1.02,
+        xanchor="left",
+        x=0,
+        bgcolor='rgba(255,255,255,0.9)',
+        bordercolor='rgba(0,0,0,0.3)',
+        borderwidth=1,
+        font=dict(size=14),
+        itemdoubleclick=False,
+        groupclick="toggleitem",
+        itemsizing="constant",
+    ),
+    plot_bgcolor='#ffffff',
+    xaxis=dict(automargin=True, gridcolor='#eeeeee'),
+    yaxis=dict(automargin=True, gridcolor='#eeeeee'),
+    hoverlabel=dict(font=dict(family=FONT_FAMILY)),
+))
+
+
+def make_figure(traces, height, **layout):
+    layout.setdefault('margin', dict(t=40, b=40, l=10, r=10))
+    return go.Figure(data=traces, layout=dict(template=TEMPLATE, height=height, **layout))
+
+
+# Первые limit категорий по убыванию веса и «прочие» с суммой остальных.
+# values — одна колонка или несколько (по строке на категорию); вес — weight
+# или, если он не задан, сумма строки
+def cap_categories(labels, values, limit=CATEGORY_LIMIT, weight=None):
+    labels = np.asarray(labels, dtype=object)
+    values = np.asarray(values, dtype=np.float64)
+    if weight is None:
+        weight = values if values.ndim == 1 else values.sum(axis=1)
+    order = np.argsort(-weight, kind='stable')
+    if len(order) <= limit + 1:
+        return labels[order], values[order]
+    head, tail = order[:limit], order[limit:]
+    others = values[tail].sum(axis=0, keepdims=True)
+    return np.append(labels[head], OTHERS_LABEL), np.concatenate([values[head], others])
+
+
+def clients_figure(client_status):
+    clients, values = cap_categories(
+        client_status['клиент'].to_numpy(),
+        client_status[['отгружено', 'на_причале', 'в_транзите']].to_numpy(),
+    )
+
+    # В каждом трейсе только клиенты с ненулевым значением: при отключении
+    # статуса в легенде пустые столбцы не остаются на оси
+    traces = []
+    for column, (name, color) in enumerate([('Отгружено', '#FF6B6B'), ('На причале', '#4ECDC4'),
+                                            ('В транзите', '#45B7D1')]):
+        nonzero = values[:, column] > 0
+        traces.append(go.Bar(
+            name=name,
+            x=clients[nonzero],
+            y=values[nonzero, column],
+            marker_color=color,
+            hovertemplate=f'<b>%{{x}}</b><br>{name}: %{{y:,.1f}} т<extra></extra>',
+        ))
+
+    return make_figure(traces, height=500, barmode='stack', showlegend=True,
+                       xaxis=dict(tickangle=-45, categoryorder='array', categoryarray=clients))
+
+
+def today_figure(active_today_clients, today):
+    clients, tonnage = cap_categories(active_today_clients['клиент'].to_numpy(),
+                                      active_today_clients['брутто'].to_numpy())
+    trace = go.Bar(
+        x=clients,
+        y=tonnage,
+        marker=dict(color=tonnage, colorscale='Viridis'),
+        hovertemplate='<b>%{x}</b><br>%{y:,.1f} т<extra></extra>',
+    )
+    return make_figure([trace], height=400, title=f"Отгрузки за {today.strftime('%d.%m.%Y')}",
+                       xaxis=dict(tickangle=-45))
+
+
+# График принято vs отгружено
+def period_figure(monthly_stats):
+    periods = monthly_stats.iloc[:, 0].to_numpy()
+    traces = [
+        go.Bar(name='Принято', x=periods, y=monthly_stats['принято_тонн'].to_numpy(), marker_color='#4ECDC4'),
+        go.Bar(name='Отгружено', x=periods, y=monthly_stats['отгружено_тонн'].to_numpy(), marker_color='#FF6B6B'),
+    ]
+    return make_figure(traces, height=400, barmode='group', showlegend=True, xaxis=dict(tickangle=-45))
+
+
+# График уникальных клиентов по периодам
+def unique_clients_figure(monthly_stats, period_title):
+    line = go.Scattergl if len(monthly_stats) >= WEBGL_THRESHOLD else go.Scatter
+    trace = line(
+        x=monthly_stats.iloc[:, 0].to_numpy(),
+        y=monthly_stats['уникальных_клиентов'].to_numpy(),
+        mode='lines+markers',
+        line_color='#45B7D1',
+    )
+    return make_figure([trace], height=300, title=f'Количество уникальных клиентов {period_title}')
+
+
+# Горизонтальные столбцы, самый большой сверху. «Прочие» — отдельный серый
+# столбец внизу: их сумма не растягивает цветовую шкалу остальных
+def ranked_bars(labels, values, colors, colorscale, height, title, colorbar_title=None):
+    labels = np.asarray(labels, dtype=object)
+    values = np.asarray(values)
+    colors = np.asarray(colors)
+    ranked = labels != OTHERS_LABEL
+    hovertemplate = '<b>%{y}</b><br>%{x:,.1f} т<extra></extra>'
+    traces = [go.Bar(
+        x=values[ranked],
+        y=labels[ranked],
+        orientation='h',
+        marker=dict(color=colors[ranked], colorscale=colorscale, showscale=colorbar_title is not None,
+                    colorbar=dict(title=dict(text=colorbar_title)) if colorbar_title else None),
+        hovertemplate=hovertemplate,
+    )]
+    if not ranked.all():
+        traces.append(go.Bar(x=values[~ranked], y=labels[~ranked], orientation='h',
+                             marker_color=OTHERS_COLOR, hovertemplate=hovertemplate))
+    return make_figure(traces, height=height, title=title, showlegend=False, yaxis=dict(autorange='reversed'))
+
+
+def top_clients_figure(top_clients):
+    tonnage = top_clients['общий_вес'].to_numpy()
+    return ranked_bars(top_clients['клиент'].to_numpy(), tonnage, tonnage, 'Blues', 500,
+                       "Топ-15 клиентов по общему тоннажу")
+
+
+def vessels_figure(vessel_stats):
+    return ranked_bars(vessel_stats['судно'].to_numpy(), vessel_stats['общий_тоннаж'].to_numpy(),
+                       vessel_stats['количество_заходов'].to_numpy(), 'Greens', 400,
+                       "Топ-10 судов по тоннажу", colorbar_title="Кол-во заходов")
+
+
+def pier_stock_figure(stock, column):
+    labels, values = cap_categories(stock[column].to_numpy(), stock[['тоннаж', 'мест']].to_numpy(),
+                                    limit=15, weight=stock['тоннаж'].to_numpy())
+    return ranked_bars(labels, values[:, 0], values[:, 1], 'Teal', 450, "Груз на причале")
+
+
+# Распределение сроков хранения или возраста груза по корзинам дней
+def days_histogram_figure(buckets, title, color):
+    trace = go.Bar(
+        x=buckets['дней'].to_numpy(),
+        y=buckets['тоннаж'].to_numpy(),
+        customdata=buckets['мест'].to_numpy(),
+        marker_color=color,
+        hovertemplate='<b>%{x} дн.</b><br>%{y:,.1f} т, мест: %{customdata}<extra></extra>',
+    )
+    return make_figure([trace], height=350, title=title,
+                       xaxis=dict(title='дней', type='category'), yaxis=dict(title='т'))
@@ -0,0 +1,206 @@
+"""Замеры времени и памяти по этапам загрузки журнала и отрисовки страницы."""
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Диагностика на странице; её также можно открыть параметром ?diagnostics=1
+DIAGNOSTICS = os.environ.get('YAKHROMA_DIAGNOSTICS', '') not in ('', '0')
+
+# Журнал замеров в формате JSON lines и файл метрик для textfile-коллектора Prometheus
+METRICS_LOG = os.environ.get('YAKHROMA_METRICS_LOG')
+METRICS_PROM = os.environ.get('YAKHROMA_METRICS_PROM')
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_DISABLED = nullcontext()
+_END = object()
+
+
+# Текущий RSS процесса по /proc (Linux). Без /proc (macOS, Windows) RSS не
+# замеряется и считается нулевым: getrusage отдаёт только пиковый RSS, да ещё
+# в разных единицах на разных системах
+def current_rss():
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class StageLog:
+    """Время и изменение RSS по этапам одного прохода: перезапуска страницы или обновления журнала.
+
+    Этапы с одинаковым именем суммируются, поэтому обработку по частям можно
+    замерять внутри цикла. Выключенный журнал ничего не замеряет: stage()
+    отдаёт общий пустой контекст, checkpoint() сразу возвращается.
+
+    Вложенные журналы (children) подробно расписывают один из этапов,
+    например обновление каждого источника; в total() они не входят.
+    """
+
+    def __init__(self, scope, enabled=True):
+        self.scope = scope
+        self.enabled = enabled
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.children = {}
+        self._current = None
+
+    def stage(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name):
+        rss = current_rss()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, current_rss() - rss)
+
+    # Время ожидания каждой следующей части итератора (например, чтения выгрузки)
+    def iterate(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    # Для линейного скрипта страницы: закрывает текущий этап и открывает следующий
+    def checkpoint(self, name=None):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        rss = current_rss()
+        if self._current is not None:
+            current_name, started, started_rss = self._current
+            self.add(current_name, now - started, rss - started_rss)
+        self._current = (name, now, rss) if name is not None else None
+
+    def finish(self):
+        self.checkpoint(None)
+        return self
+
+    def add(self, name, seconds, rss_delta=0):
+        record = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rss_delta': 0})
+        record['seconds'] += seconds
+        record['calls'] += 1
+        record['rss_delta'] += rss_delta
+
+    def nest(self, name, log):
+        self.children[name] = log
+
+    def total(self):
+        return sum(record['seconds'] for record in self.stages.values())
+
+    def records(self):
+        return [{'stage': name, **record} for name, record in self.stages.items()]
+
+    def to_dict(self):
+        entry = {
+            'scope': self.scope,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': self.total(),
+            'stages': self.records(),
+        }
+        if self.children:
+            entry['children'] = {name: log.to_dict() for name, log in self.children.items()}
+        return entry
+
+    # Пары (область, журнал) для этого журнала и вложенных: «refresh», «refresh/Яхрома»
+    def scopes(self, scope=None):
+        scope = scope or self.scope
+        yield scope, self
+        for name, log in self.children.items():
+            yield from log.scopes(f'{scope}/{name}')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsSink:
+    """Пишет замеры в журнал JSON lines и в текстовый файл метрик Prometheus.
+
+    Файл метрик перезаписывается целиком: в нём последние замеры каждого
+    прохода (страница, обновление журнала) и переданные счётчики.
+    Без заданных путей sink выключен и record() ничего не делает.
+    """
+
+    def __init__(self, log_path=METRICS_LOG, prom_path=METRICS_PROM):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self._last = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.log_path or self.prom_path)
+
+    # values — метрики вида {'memo_hits_total': 10}; имена на _total пишутся как счётчики
+    def record(self, log, **values):
+        if not self.enabled or not log.enabled:
+            return
+        entry = {**log.to_dict(), **values}
+        try:
+            with self._lock:
+                self._last[log.scope] = log
+                self._values.update(values)
+                if self.log_path:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                if self.prom_path:
+                    self._write_prometheus()
+        except OSError:
+            # Запись метрик не должна ронять страницу или поток обновления
+            pass
+
+    def _write_prometheus(self):
+        lines = [
+            '# HELP yakhroma_stage_seconds Длительность этапа в последнем проходе, секунды',
+            '# TYPE yakhroma_stage_seconds gauge',
+        ]
+        scopes = [pair for scope, log in self._last.items() for pair in log.scopes(scope)]
+        for scope, log in scopes:
+            for name, record in log.stages.items():
+                lines.append(f'yakhroma_stage_seconds{{scope="{_escape_label(scope)}",'
+                             f'stage="{_escape_label(name)}"}} {record["seconds"]:.6f}')
+        lines.append('# TYPE yakhroma_stage_rss_delta_bytes gauge')
+        for scope, log in scopes:
+            for name, record in log.stages.items():
+                lines.append(f'yakhroma_stage_rss_delta_bytes{{scope="{_escape_label(scope)}",'
+                             f'stage="{_escape_label(name)}"}} {record["rss_delta"]}')
+        for name, value in sorted(self._values.items()):
+            if value is None:
+                continue
+            kind = 'counter' if name.endswith('_total') else 'gauge'
+            lines.append(f'# TYPE yakhroma_{name} {kind}')
+            lines.append(f'yakhroma_{name} {value}')
+
+        tmp_path = f'{self.prom_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prom_path)
+
+
+# Текстовый отчёт cProfile: самые дорогие функции по суммарному времени
+def profile_report(profiler, limit=30, sort='cumulative'):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def start_profiler():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
@@ -0,0 +1,277 @@
+"""Груз на причале и сроки хранения, обновляемые по изменённым строкам журнала."""
+import numpy as np
+import pandas as pd
+
+from vessels import split_voyages
+
+# Пустая дата в построчном состоянии
+NO_DAY = np.iinfo(np.int32).min
+
+# Границы корзин, дни: срок хранения отгруженного груза и возраст груза на причале
+DWELL_EDGES = [0, 1, 2, 3, 5, 7, 10, 14, 21, 30, 60, 90]
+AGEING_EDGES = [0, 7, 14, 30, 60, 90]
+
+
+def to_days(dates):
+    days = dates.astype('datetime64[D]')
+    return np.where(np.isnat(days), NO_DAY, days.astype(np.int64)).astype(np.int32)
+
+
+def bucket_labels(edges):
+    labels = [f'{lo}–{hi - 1}' if hi - lo > 1 else f'{lo}' for lo, hi in zip(edges[:-1], edges[1:])]
+    return labels + [f'{edges[-1]}+']
+
+
+class KeyedTotals:
+    """Вес и число строк по целочисленному ключу.
+
+    Массивы индексируются ключом минус origin и расширяются в обе стороны
+    по мере появления новых ключей. Строки добавляются и вычитаются
+    (sign=-1), поэтому итоги поддерживаются по изменениям без пересчёта.
+    """
+
+    def __init__(self):
+        self.origin = 0
+        self.weight = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int64)
+
+    # counts — число строк на ключ, если складываются уже готовые итоги
+    def add(self, keys, weights, sign=1, counts=None):
+        if len(keys) == 0:
+            return
+        keys = keys.astype(np.int64)
+        lo, hi = int(keys.min()), int(keys.max())
+        if len(self.count) == 0:
+            self.origin = lo
+        if lo < self.origin:
+            pad = self.origin - lo
+            self.weight = np.concatenate([np.zeros(pad), self.weight])
+            self.count = np.concatenate([np.zeros(pad, dtype=np.int64), self.count])
+            self.origin = lo
+        size = hi - self.origin + 1
+        if size > len(self.count):
+            self.weight = np.concatenate([self.weight, np.zeros(size - len(self.weight))])
+            self.count = np.concatenate([self.count, np.zeros(size - len(self.count), dtype=np.int64)])
+
+        index = keys - self.origin
+        self.weight[:size] += sign * np.bincount(index, weights, minlength=size)
+        self.count[:size] += sign * np.bincount(index, counts, minlength=size).astype(np.int64)
+
+    def keys(self):
+        return np.arange(self.origin, self.origin + len(self.count))
+
+    # Ключи с ненулевым числом строк и их итоги
+    def items(self):
+        present = self.count != 0
+        return self.keys()[present], self.weight[present], self.count[present]
+
+    def copy(self):
+        totals = KeyedTotals()
+        totals.origin = self.origin
+        totals.weight = self.weight.copy()
+        totals.count = self.count.copy()
+        return totals
+
+
+class Interner:
+    """Постоянные целочисленные коды для названий клиентов и судов.
+
+    Категории журнала меняются от снимка к снимку, а итоги состояния
+    индексируются кодом, поэтому коды выдаются один раз и не переиспользуются.
+    """
+
+    def __init__(self):
+        self.names = pd.Index([], dtype=object)
+
+    def codes(self, values):
+        value_codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+        ids = self.names.get_indexer(uniques)
+        new = ids < 0
+        if new.any():
+            ids[new] = np.arange(len(self.names), len(self.names) + new.sum())
+            self.names = self.names.append(uniques[new])
+        return ids[value_codes].astype(np.int32)
+
+
+class PierInventory:
+    """Построчное состояние для итогов по грузу на причале.
+
+    Для каждой строки журнала хранятся коды клиента и судна, дни принятия
+    и отгрузки и вес. При обновлении вклад изменённых строк сначала
+    вычитается из итогов, затем добавляется по новым значениям; строки,
+    пропавшие из конца выгрузки, только вычитаются. Страница читает не само
+    состояние, а неизменяемый снимок итогов (snapshot()).
+    """
+
+    def __init__(self):
+        self.clients = Interner()
+        self.vessels = Interner()
+        self.client = np.zeros(0, dtype=np.int32)
+        self.vessel = np.zeros(0, dtype=np.int32)
+        self.arrival = np.zeros(0, dtype=np.int32)
+        self.shipment = np.zeros(0, dtype=np.int32)
+        self.weight = np.zeros(0, dtype=np.float32)
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self.client_stock = KeyedTotals()
+        self.vessel_stock = KeyedTotals()
+        self.stock_by_arrival = KeyedTotals()
+        self.dwell = KeyedTotals()
+        self.negative_dwell = 0
+
+    def __len__(self):
+        return len(self.weight)
+
+    def _vessel_codes(self, names):
+        name_codes, unique_names = pd.factorize(np.asarray(names, dtype=object), use_na_sentinel=False)
+        base_names, _ = split_voyages(np.asarray(unique_names, dtype=object))
+        return self.vessels.codes(base_names)[name_codes]
+
+    def _rows(self, df):
+        return (
+            self.clients.codes(df['клиент']),
+            self._vessel_codes(df['судно']),
+            to_days(df['дата_принятия_на_пирс'].to_numpy()),
+            to_days(df['дата_отгрузки_авто'].to_numpy()),
+            df['брутто'].to_numpy(dtype=np.float32),
+        )
+
+    def _apply(self, client, vessel, arrival, shipment, weight, sign):
+        # Бесконечный вес нельзя вычесть обратно (inf - inf), поэтому он, как и пустой, считается нулём
+        weight = np.where(np.isfinite(weight), weight.astype(np.float64), 0.0)
+        arrived = arrival != NO_DAY
+        shipped = shipment != NO_DAY
+
+        on_pier = arrived & ~shipped
+        self.client_stock.add(client[on_pier], weight[on_pier], sign)
+        self.vessel_stock.add(vessel[on_pier], weight[on_pier], sign)
+        self.stock_by_arrival.add(arrival[on_pier], weight[on_pier], sign)
+
+        both = arrived & shipped
+        dwell = shipment[both].astype(np.int64) - arrival[both]
+        valid = dwell >= 0
+        self.dwell.add(dwell[valid], weight[both][valid], sign)
+        self.negative_dwell += sign * int((~valid).sum())
+
+    def rebuild(self, df):
+        self._reset_totals()
+        self.client, self.vessel, self.arrival, self.shipment, self.weight = self._rows(df)
+        self._apply(self.client, self.vessel, self.arrival, self.shipment, self.weight, 1)
+
+    # positions — строки df, изменённые или добавленные с прошлого обновления
+    def update(self, df, positions):
+        size = len(df)
+        positions = np.asarray(positions, dtype=np.int64)
+
+        # Строки, пропавшие из конца выгрузки, и старые значения изменённых строк
+        removed = np.concatenate([positions[positions < min(size, len(self))],
+                                  np.arange(size, len(self), dtype=np.int64)])
+        self._apply(self.client[removed], self.vessel[removed], self.arrival[removed],
+                    self.shipment[removed], self.weight[removed], -1)
+
+        if size != len(self):
+            self.client, self.vessel, self.arrival, self.shipment, self.weight = (
+                column[:size].copy() if size < len(column) else
+                np.concatenate([column, np.zeros(size - len(column), dtype=column.dtype)])
+                for column in (self.client, self.vessel, self.arrival, self.shipment, self.weight)
+            )
+
+        rows = self._rows(df.iloc[positions])
+        for column, values in zip((self.client, self.vessel, self.arrival, self.shipment, self.weight), rows):
+            column[positions] = values
+        self._apply(*rows, 1)
+
+    def snapshot(self, fingerprint=None):
+        return PierSnapshot(self, fingerprint)
+
+
+class PierSnapshot:
+    """Неизменяемые итоги по грузу на причале и срокам хранения для страницы.
+
+    Содержит только итоги по клиентам, судам, дням принятия и длительностям,
+    поэтому запросы не зависят от длины истории журнала.
+    """
+
+    def __init__(self, inventory, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.clients = np.asarray(inventory.clients.names, dtype=object)
+        self.vessels = np.asarray(inventory.vessels.names, dtype=object)
+        self.client_stock = inventory.client_stock.copy()
+        self.vessel_stock = inventory.vessel_stock.copy()
+        self.stock_by_arrival = inventory.stock_by_arrival.copy()
+        self.dwell = inventory.dwell.copy()
+        self.negative_dwell = inventory.negative_dwell
+
+    # Итоги нескольких журналов (например, разных причалов): клиенты и суда сводятся по названию
+    @classmethod
+    def merge(cls, snapshots, fingerprint=None):
+        inventory = PierInventory()
+        for snapshot in snapshots:
+            keys, weight, count = snapshot.client_stock.items()
+            inventory.client_stock.add(inventory.clients.codes(snapshot.clients[keys]), weight, counts=count)
+            keys, weight, count = snapshot.vessel_stock.items()
+            inventory.vessel_stock.add(inventory.vessels.codes(snapshot.vessels[keys]), weight, counts=count)
+            keys, weight, count = snapshot.stock_by_arrival.items()
+            inventory.stock_by_arrival.add(keys, weight, counts=count)
+            keys, weight, count = snapshot.dwell.items()
+            inventory.dwell.add(keys, weight, counts=count)
+            inventory.negative_dwell += snapshot.negative_dwell
+        return inventory.snapshot(fingerprint)
+
+    def total(self):
+        return float(self.stock_by_arrival.weight.sum()), int(self.stock_by_arrival.count.sum())
+
+    def _stock(self, totals, names, column):
+        present = totals.count > 0
+        stock = pd.DataFrame({
+            column: names[totals.keys()[present]],
+            'тоннаж': totals.weight[present],
+            'мест': totals.count[present],
+        })
+        return stock.sort_values('тоннаж', ascending=False).reset_index(drop=True)
+
+    def stock_by_client(self):
+        return self._stock(self.client_stock, self.clients, 'клиент')
+
+    def stock_by_vessel(self):
+        return self._stock(self.vessel_stock, self.vessels, 'судно')
+
+    # Сумма итогов по корзинам [edges[i], edges[i+1]), последняя корзина открыта справа
+    @staticmethod
+    def _buckets(values, totals_weight, totals_count, edges):
+        bucket = np.searchsorted(edges, values, side='right') - 1
+        bucket = np.clip(bucket, 0, len(edges) - 1)
+        return pd.DataFrame({
+            'дней': bucket_labels(edges),
+            'тоннаж': np.bincount(bucket, totals_weight, minlength=len(edges)),
+            'мест': np.bincount(bucket, totals_count, minlength=len(edges)).astype(np.int64),
+        })
+
+    # Распределение сроков хранения отгруженного груза (от принятия до отгрузки)
+    def dwell_histogram(self, edges=DWELL_EDGES):
+        return self._buckets(self.dwell.keys(), self.dwell.weight, self.dwell.count, edges)
+
+    # Перцентили срока хранения по числу мест, дни
+    def dwell_percentiles(self, percentiles=(50, 75, 90, 95)):
+        cumulative = np.cumsum(self.dwell.count)
+        if len(cumulative) == 0 or cumulative[-1] == 0:
+            return {p: None for p in percentiles}
+        keys = self.dwell.keys()
+        return {p: int(keys[np.searchsorted(cumulative, cumulative[-1] * p / 100, side='left')])
+                for p in percentiles}
+
+    def _ages(self, today):
+        today = np.datetime64(pd.Timestamp(today).date(), 'D').astype(np.int64)
+        return today - self.stock_by_arrival.keys()
+
+    # Груз на причале по возрасту (дней с принятия на сегодня)
+    def ageing(self, today, edges=AGEING_EDGES):
+        ages = np.maximum(self._ages(today), 0)
+        return self._buckets(ages, self.stock_by_arrival.weight, self.stock_by_arrival.count, edges)
+
+    # Груз, лежащий на причале дольше days дней: (тонн, мест)
+    def older_than(self, days, today):
+        older = self._ages(today) > days
+        return float(self.stock_by_arrival.weight[older].sum()), int(self.stock_by_arrival.count[older].sum())
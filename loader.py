@@ -0,0 +1,321 @@
+"""Загрузка выгрузки Google Sheets и инкрементальное обновление журнала."""
+import os
+import threading
+from contextlib import contextmanager
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from processing import (CLEANED_COLUMNS, clean_data, compact_ledger, concat_ledger, map_columns,
+                        memory_usage, normalize_column_names)
+from schema import LEDGER_SCHEMA, SchemaError
+from memo import FINGERPRINT_ATTR, snapshot_fingerprint
+from instrumentation import StageLog
+from inventory import PierInventory
+from storage import load_snapshot, save_snapshot
+
+DEFAULT_SOURCE_URL = 'https://docs.google.com/spreadsheets/d/1rkmxMAb7B0RjM3PHknnkix_P5izTWyNIA3KTZvy9sWs/export?format=csv'
+
+# Источник можно подменить локальным файлом или локальным HTTP-сервером
+SOURCE_URL = os.environ.get('YAKHROMA_SOURCE_URL', DEFAULT_SOURCE_URL)
+
+# Таймаут загрузки выгрузки по сети, секунды
+FETCH_TIMEOUT = float(os.environ.get('YAKHROMA_FETCH_TIMEOUT', 30))
+
+# Число строк выгрузки, которое читается и очищается за один шаг
+CHUNK_SIZE = int(os.environ.get('YAKHROMA_CHUNK_SIZE', 50000))
+
+
+@contextmanager
+def open_source(url, timeout=FETCH_TIMEOUT):
+    if urllib.parse.urlparse(url).scheme in ('http', 'https'):
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            yield response
+    else:
+        yield url
+
+
+# Выгрузка читается потоком по частям. Все значения читаются как текст:
+# иначе тип колонки угадывался бы по каждой части отдельно
+def read_chunks(url=SOURCE_URL, chunksize=CHUNK_SIZE, timeout=FETCH_TIMEOUT):
+    with open_source(url, timeout) as source:
+        yield from pd.read_csv(source, dtype=str, chunksize=chunksize)
+
+
+def hash_rows(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class IncrementalLedger:
+    """Обработанный журнал, который обновляется по разнице с предыдущим снимком.
+
+    Строка таблицы идентифицируется хешем своего содержимого: очищенные
+    значения берутся из строки прошлого снимка с тем же хешем, где бы она ни
+    стояла, поэтому вставка, удаление или пересортировка строк не вызывает
+    переочистки всего, что ниже. Через очистку проходят только строки с
+    новым хешем (changed_rows).
+
+    fetch(url) возвращает DataFrame или итератор его частей; части очищаются
+    и сжимаются по одной, поэтому сырой текст выгрузки целиком в памяти не
+    держится. Сжатые части и их склейка какое-то время существуют вместе:
+    пик — около двух компактных журналов плюс одна сырая часть, и от размера
+    части зависит только последнее слагаемое.
+
+    Если задан cache_path, каждый снимок сохраняется на диск, а при старте
+    процесса журнал сразу поднимается из файла (validated=False) до первой
+    сверки с источником.
+
+    Итоги по грузу на причале и срокам хранения (pier) поддерживаются по
+    позициям, где строка отличается от прошлого снимка: это только
+    арифметика над массивами, без разбора значений.
+
+    Время этапов последнего обновления лежит в stages (StageLog). Замер
+    идёт по частям выгрузки, а не по строкам, поэтому почти ничего не стоит.
+    Объём журнала в памяти (memory_after) замеряется, только если снимок
+    изменился, а объём до компактизации (memory_before) — только при полной
+    пересборке: deep-замер текстовых колонок дорог для каждого обновления.
+
+    Заголовок сопоставляется со схемой (schema.LEDGER_SCHEMA): выгрузка без
+    обязательных колонок отклоняется до разбора строк, а журнал остаётся
+    прежним. Хеши строк считаются только по колонкам схемы, поэтому
+    переименование колонки в допустимое название или новые посторонние
+    колонки не вызывают полной переочистки. Число отклонённых значений по
+    колонкам (rejected) поддерживается по тем же изменённым строкам.
+    """
+
+    def __init__(self, url=SOURCE_URL, fetch=read_chunks, cache_path=None):
+        self.url = url
+        self.fetch = fetch
+        self.cache_path = cache_path
+        self.df = None
+        self.changed_rows = 0
+        self.memory_before = None
+        self.memory_after = None
+        self.validated = False
+        self.cached_at = None
+        self.built_at = None
+        self.stages = None
+        self.pier = None
+        self.resolution = None
+        self.rejected = {}
+        self._columns = None
+        self._hashes = None
+        self._rejected = None
+        self._saved = None
+        self._inventory = PierInventory()
+        self._changed_positions = []
+        self._lock = threading.Lock()
+
+    def load_cache(self):
+        snapshot = load_snapshot(self.url, self.cache_path) if self.cache_path else None
+        if snapshot is None:
+            return False
+
+        df, hashes, rejected, stamp = snapshot
+        try:
+            resolution = LEDGER_SCHEMA.resolve(stamp['columns'])
+        except SchemaError:
+            return False
+
+        with self._lock:
+            if self.df is None:
+                self.df, self._hashes, self._rejected = df, hashes, rejected
+                self._columns = stamp['columns']
+                self.resolution = resolution
+                self.rejected = LEDGER_SCHEMA.rejected_counts(rejected)
+                self.cached_at = self.built_at = datetime.fromisoformat(stamp['saved_at'])
+                self.memory_after = memory_usage(self.df)
+                self._stamp_fingerprint()
+                self._saved = self.df.attrs[FINGERPRINT_ATTR]
+                self._inventory.rebuild(self.df)
+                self.pier = self._inventory.snapshot(self.df.attrs[FINGERPRINT_ATTR])
+        return True
+
+    def refresh(self):
+        with self._lock:
+            log = StageLog('refresh')
+            with log.stage('fetch'):
+                chunks = self.fetch(self.url)
+            if isinstance(chunks, pd.DataFrame):
+                chunks = [chunks]
+            self.apply_chunks(log.iterate('fetch', chunks), log)
+            self.validated = True
+            with log.stage('save_cache'):
+                self._save_cache()
+            self.stages = log.finish()
+            return self.df
+
+    # Файл переписывается, только если снимок изменился с последней записи
+    def _save_cache(self):
+        fingerprint = self.df.attrs[FINGERPRINT_ATTR]
+        if not self.cache_path or fingerprint == self._saved:
+            return
+        try:
+            save_snapshot(self.df, self._hashes, self._rejected, self._columns, self.url, self.cache_path)
+            self._saved = fingerprint
+        except Exception:
+            # Кэш на диске только ускоряет холодный старт, его отсутствие не ошибка
+            pass
+
+    def apply_chunks(self, chunks, log=None):
+        log = log or StageLog('refresh', enabled=False)
+        pieces = []
+        hashes = []
+        flags = []
+        columns = None
+        offset = 0
+        memory_before = 0
+        self.changed_rows = 0
+        self._changed_positions = []
+
+        for raw in chunks:
+            with log.stage('normalize'):
+                raw = normalize_column_names(raw)
+                if columns is None:
+                    # Сопоставление колонок определяется один раз по заголовку
+                    # (и кэшируется схемой); без обязательных колонок — SchemaError
+                    columns = list(raw.columns)
+                    resolution = LEDGER_SCHEMA.resolve(columns)
+                    rebuild = (self.df is None or self.resolution is None
+                               or list(resolution.mapping) != list(self.resolution.mapping))
+                    lookup = None if rebuild else self._row_lookup()
+
+            with log.stage('hash'):
+                chunk_hashes = hash_rows(raw[resolution.columns])
+
+            with log.stage('parse'):
+                df = map_columns(raw.reset_index(drop=True), resolution.mapping)
+                if rebuild:
+                    rejected = {}
+                    df = clean_data(df, rejected)
+                    flags.append(LEDGER_SCHEMA.pack_rejected(rejected, len(df)))
+                    self.changed_rows += len(df)
+                else:
+                    df, chunk_flags = self._patch(df, chunk_hashes, offset, lookup)
+                    flags.append(chunk_flags)
+
+            if rebuild:
+                with log.stage('memory_report'):
+                    memory_before += memory_usage(df)
+            with log.stage('compact'):
+                pieces.append(compact_ledger(df, columns))
+            hashes.append(chunk_hashes)
+            offset += len(df)
+
+        if columns is None:
+            raise ValueError("Пустая выгрузка: нет ни заголовка, ни строк")
+
+        with log.stage('concat'):
+            df = concat_ledger(pieces)
+        if rebuild:
+            self.memory_before = memory_before
+        if rebuild or self.changed_rows:
+            with log.stage('memory_report'):
+                self.memory_after = memory_usage(df)
+
+        with log.stage('inventory'):
+            if rebuild:
+                self._inventory.rebuild(df)
+            else:
+                self._inventory.update(df, np.concatenate(self._changed_positions))
+
+        self.df = df
+        self.built_at = datetime.now()
+        self._columns = columns
+        self._hashes = np.concatenate(hashes)
+        self._rejected = np.concatenate(flags)
+        self.resolution = resolution
+        self.rejected = LEDGER_SCHEMA.rejected_counts(self._rejected)
+        self._stamp_fingerprint()
+        self.pier = self._inventory.snapshot(df.attrs[FINGERPRINT_ATTR])
+
+    # Итоги по причалу для снимка df; если поток обновления уже заменил снимок, они строятся заново
+    def pier_snapshot(self, df):
+        pier = self.pier
+        if pier is not None and pier.fingerprint == df.attrs.get(FINGERPRINT_ATTR):
+            return pier
+        inventory = PierInventory()
+        inventory.rebuild(df)
+        return inventory.snapshot(df.attrs.get(FINGERPRINT_ATTR))
+
+    # Снимок заменяется равным ему срезом строк общего журнала нескольких
+    # источников (sources.MultiSourceLedger): срез — представление, а не
+    # копия, и строки не хранятся в памяти дважды. Если снимок уже успел
+    # обновиться, замены нет
+    def share_frame(self, df, fingerprint):
+        with self._lock:
+            if self.df is None or self.df.attrs.get(FINGERPRINT_ATTR) != fingerprint:
+                return False
+            df.index = pd.RangeIndex(len(df))
+            df.attrs = dict(self.df.attrs)
+            self.df = df
+            return True
+
+    # Снимки, которые сейчас отдаёт загрузчик
+    def frames(self):
+        df = self.df
+        return [] if df is None else [df]
+
+    # Сопоставление колонок схемы с заголовком выгрузки и число отклонённых значений
+    def schema_report(self):
+        resolution = self.resolution
+        if resolution is None:
+            return None
+        return pd.DataFrame({
+            'колонка': LEDGER_SCHEMA.names,
+            'заголовок': [resolution.mapping.get(name) for name in LEDGER_SCHEMA.names],
+            'отклонено': [self.rejected.get(name, 0) for name in LEDGER_SCHEMA.names],
+        })
+
+    def _stamp_fingerprint(self):
+        self.df.attrs[FINGERPRINT_ATTR] = snapshot_fingerprint(self._hashes, self._columns)
+
+    # Хеши строк прошлого снимка по возрастанию и позиции этих строк
+    def _row_lookup(self):
+        order = np.argsort(self._hashes, kind='stable')
+        return self._hashes[order], order
+
+    # Часть выгрузки, начинающаяся со строки offset: строки, хеш которых был в
+    # прошлом снимке, берутся из него, остальные очищаются. Возвращает
+    # собранную часть и отметки отклонённых значений её строк
+    def _patch(self, df, hashes, offset, lookup):
+        previous_hashes = self._hashes[offset:offset + len(hashes)]
+        common = len(previous_hashes)
+        moved = np.ones(len(hashes), dtype=bool)
+        moved[:common] = hashes[:common] != previous_hashes
+        self._changed_positions.append(np.flatnonzero(moved) + offset)
+
+        sorted_hashes, order = lookup
+        if not len(sorted_hashes):
+            self.changed_rows += len(df)
+            rejected = {}
+            df = clean_data(df, rejected)
+            return df, LEDGER_SCHEMA.pack_rejected(rejected, len(df))
+
+        index = np.minimum(np.searchsorted(sorted_hashes, hashes), len(sorted_hashes) - 1)
+        changed = sorted_hashes[index] != hashes
+        source = order[index]
+        self.changed_rows += int(changed.sum())
+
+        flags = self._rejected[source]
+        delta = None
+        if changed.any():
+            rejected = {}
+            delta = clean_data(df[changed].copy(), rejected)
+            flags[changed] = LEDGER_SCHEMA.pack_rejected(rejected, len(delta))
+
+        # Очищенные значения остальных строк берём из строк прошлого снимка с тем же хешем
+        for col in CLEANED_COLUMNS:
+            column = self.df[col].iloc[source].reset_index(drop=True)
+            # Снимок хранится в компактном виде, сборка идёт в типах clean_data
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype(object)
+            elif column.dtype == np.float32:
+                column = column.astype(np.float64)
+            if delta is not None:
+                column[changed] = delta[col].to_numpy()
+            df[col] = column.to_numpy()
+        return df, flags
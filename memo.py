@@ -0,0 +1,173 @@
+"""Мемоизация производных таблиц и графиков по отпечатку снимка журнала."""
+import hashlib
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+FINGERPRINT_ATTR = 'fingerprint'
+
+
+def snapshot_fingerprint(hashes, columns):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\x1f'.join(columns).encode('utf-8'))
+    digest.update(hashes.tobytes())
+    return digest.hexdigest()
+
+
+# Отпечаток содержимого журнала; загрузчик кладёт его в df.attrs,
+# для прочих таблиц он считается по хешам строк
+def fingerprint(df):
+    value = df.attrs.get(FINGERPRINT_ATTR)
+    if value is None:
+        hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+        value = snapshot_fingerprint(hashes, [str(col) for col in df.columns])
+        df.attrs[FINGERPRINT_ATTR] = value
+    return value
+
+
+class SnapshotMemo:
+    """Ограниченный LRU-кэш значений, вычисленных по снимку журнала.
+
+    Ключ — пара (отпечаток снимка, имя значения), поэтому после изменения
+    данных старые записи просто перестают запрашиваться и вытесняются.
+    Значения общие для всех сессий и не должны изменяться на месте.
+
+    Значение вычисляется один раз: если его уже считает другая сессия
+    (например, все открытые страницы сразу после обновления журнала),
+    остальные ждут её результат, а не считают то же самое параллельно.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, snapshot, name, compute):
+        key = (snapshot, name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                owner = True
+            else:
+                self.waits += 1
+                owner = False
+
+        # Значение уже считается в другом потоке; его ошибка поднимается и здесь
+        if not owner:
+            return pending.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self.misses += 1
+            del self._pending[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        pending.set_result(value)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Отпечатки снимков, для которых в кэше есть значения
+    def snapshots(self):
+        with self._lock:
+            return {snapshot for snapshot, _ in self._entries}
+
+    # Удаляет все значения снимка, возвращает их число
+    def release(self, snapshot):
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == snapshot]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SnapshotLease:
+    """Снимок журнала, который показывает один перезапуск страницы.
+
+    Аренда отпускается явно (release, повторный вызов ничего не делает) или
+    при сборке мусора, если перезапуск прервался до release.
+    """
+
+    def __init__(self, store, snapshot):
+        self.snapshot = snapshot
+        self._finalizer = weakref.finalize(self, store._release, snapshot)
+
+    def release(self):
+        self._finalizer()
+
+
+class SnapshotStore:
+    """Учёт снимков журнала, общих для всех сессий процесса.
+
+    Журнал и его производные значения существуют в одном экземпляре на
+    процесс: журнал — у загрузчика, таблицы и графики — в SnapshotMemo.
+    Сессии получают на них ссылки, а не копии, и не должны изменять их на
+    месте. Каждый перезапуск страницы арендует снимок, который показывает
+    (lease), на время отрисовки; снимки считаются по числу аренд.
+
+    Когда загрузчик заменил снимок (frames() его больше не возвращает) и
+    последняя сессия его отпустила, значения снимка удаляются из memo сразу,
+    не дожидаясь вытеснения по LRU.
+    """
+
+    def __init__(self, memo, frames):
+        self.memo = memo
+        self.frames = frames
+        self.released = 0
+        self._refs = Counter()
+        self._lock = threading.Lock()
+
+    def lease(self, df):
+        snapshot = fingerprint(df)
+        with self._lock:
+            self._refs[snapshot] += 1
+        self.sweep()
+        return SnapshotLease(self, snapshot)
+
+    def _release(self, snapshot):
+        with self._lock:
+            self._refs[snapshot] -= 1
+            if self._refs[snapshot] <= 0:
+                del self._refs[snapshot]
+        self.sweep()
+
+    # Снимки в memo, которые загрузчик уже заменил и которые не арендует ни одна сессия
+    def sweep(self):
+        live = {fingerprint(frame) for frame in self.frames()}
+        with self._lock:
+            stale = self.memo.snapshots() - live - set(self._refs)
+            for snapshot in stale:
+                self.memo.release(snapshot)
+            self.released += len(stale)
+        return stale
+
+    @property
+    def leases(self):
+        with self._lock:
+            return sum(self._refs.values())
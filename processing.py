@@ -0,0 +1,201 @@
+"""Очистка и нормализация выгрузки журнала причала."""
+from functools import lru_cache
+
+import pandas as pd
+import numpy as np
+from pandas.api.types import union_categoricals
+
+from schema import DATE, FLOAT, LEDGER_SCHEMA, TEXT
+
+DATE_FORMAT = '%d.%m.%Y'
+
+# Состав и типы колонок объявлены в схеме выгрузки
+REQUIRED_COLUMNS = LEDGER_SCHEMA.names
+
+TEXT_COLUMNS = LEDGER_SCHEMA.names_of(TEXT)
+
+DATE_COLUMNS = {name: LEDGER_SCHEMA.by_name[name].parsed for name in LEDGER_SCHEMA.names_of(DATE)}
+
+FLOAT_COLUMNS = LEDGER_SCHEMA.names_of(FLOAT)
+
+# Колонки, которые заполняет clean_data
+CLEANED_COLUMNS = list(DATE_COLUMNS.values()) + FLOAT_COLUMNS + TEXT_COLUMNS
+
+# Повторяющиеся значения с небольшим числом вариантов
+CATEGORY_COLUMNS = ['клиент', 'судно', 'перевозчик', 'номер авто']
+
+
+# Нормализация названий столбцов
+def normalize_column_names(df):
+    df.columns = df.columns.str.lower().str.replace('ё', 'е').str.replace('c', 'с', regex=False)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+# Сопоставление колонок по схеме (кэшируется по заголовку); без обязательных колонок — SchemaError
+def resolve_columns(columns):
+    return LEDGER_SCHEMA.resolve(columns).mapping
+
+
+# Найденные колонки копируются под стандартными именами; необязательные
+# колонки, которых нет в выгрузке, остаются пустыми
+def map_columns(df, column_mapping=None):
+    if column_mapping is None:
+        column_mapping = resolve_columns(df.columns)
+
+    for standard_name in REQUIRED_COLUMNS:
+        if standard_name in column_mapping:
+            df[standard_name] = df[column_mapping[standard_name]]
+        else:
+            df[standard_name] = np.nan
+
+    return df
+
+
+def _is_blank(stripped):
+    return stripped.isna() | (stripped == '') | (stripped == 'nan')
+
+
+# Разбор одиночного значения в смешанном формате (только для строк,
+# не прошедших быстрый разбор по DATE_FORMAT). Кэш общий для всех частей
+# выгрузки и обновлений: одни и те же нестандартные даты встречаются повторно
+@lru_cache(maxsize=65536)
+def _parse_date_fallback(date_str):
+    try:
+        return pd.to_datetime(date_str)
+    except Exception:
+        return pd.NaT
+
+
+# Преобразование дат: основной формат разбирается за один проход,
+# остальные значения — поштучно и только уникальные
+def parse_dates(series):
+    stripped = series.astype(str).str.strip()
+    blank = series.isna() | _is_blank(stripped)
+
+    parsed = pd.to_datetime(stripped.where(~blank), format=DATE_FORMAT, errors='coerce')
+
+    failed = parsed.isna() & ~blank
+    if failed.any():
+        originals = series[failed]
+        fallback = {value: _parse_date_fallback(value) for value in originals.unique()}
+        parsed[failed] = pd.to_datetime(originals.map(fallback), errors='coerce')
+
+    return parsed.astype('datetime64[ns]')
+
+
+# Преобразование чисел: десятичная запятая заменяется строковыми операциями над всей колонкой
+def convert_to_float(series):
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float).where(lambda values: np.isfinite(values))
+
+    as_str = series.astype(str)
+    blank = series.isna() | _is_blank(as_str.str.strip())
+    stripped = as_str.str.replace(',', '.', regex=False).str.strip()
+
+    result = pd.to_numeric(stripped.where(~blank), errors='coerce').astype(float)
+
+    # Редкие значения, которые понимает float(), но не to_numeric (например, '1_000')
+    failed = result.isna() & ~blank
+    if failed.any():
+        def _to_float(value):
+            try:
+                return float(value)
+            except ValueError:
+                return np.nan
+        result[failed] = stripped[failed].map(_to_float)
+
+    # Бесконечный вес ('inf', '1e999') не разобран, а отклонён
+    return result.where(np.isfinite(result))
+
+
+# Преобразование текста
+def convert_to_str(series):
+    stripped = series.astype(str).str.strip()
+    blank = series.isna() | (stripped == 'nan')
+    return stripped.mask(blank, '').astype(object)
+
+
+# Отклонённые значения: непустая ячейка, которую не удалось разобрать
+def rejected_values(raw, parsed):
+    blank = raw.isna() | _is_blank(raw.astype(str).str.strip())
+    return (parsed.isna() & ~blank).to_numpy()
+
+
+# Колонки журнала сильно повторяются (даты, клиенты, суда), поэтому
+# преобразование выполняется по уникальным значениям и раскладывается по кодам.
+# Если передан словарь rejected, в него кладётся маска отклонённых строк колонки
+def _convert_unique(series, convert, rejected=None):
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    if len(uniques) * 2 > len(series):
+        converted = convert(series)
+        if rejected is not None:
+            rejected[series.name] = rejected_values(series, converted)
+        return converted
+    unique_values = pd.Series(uniques, dtype=series.dtype)
+    converted = convert(unique_values)
+    if rejected is not None:
+        rejected[series.name] = rejected_values(unique_values, converted)[codes]
+    return pd.Series(converted.to_numpy()[codes], index=series.index, name=series.name)
+
+
+# Разбор колонок по типам схемы. rejected (словарь) получает маски
+# отклонённых значений по колонкам дат и веса — проверка идёт по уникальным
+# значениям в том же проходе, что и разбор
+def clean_data(df, rejected=None):
+    for raw_col, parsed_col in DATE_COLUMNS.items():
+        df[parsed_col] = _convert_unique(df[raw_col], parse_dates, rejected)
+
+    for col in FLOAT_COLUMNS:
+        df[col] = _convert_unique(df[col], convert_to_float, rejected)
+
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = _convert_unique(df[col], convert_to_str)
+
+    return df
+
+
+# Исходные колонки, уже скопированные под стандартными именами или разобранные в даты
+def raw_duplicate_columns(raw_columns):
+    duplicates = [actual for standard, actual in resolve_columns(raw_columns).items() if actual != standard]
+    duplicates += list(DATE_COLUMNS)
+    return [col for col in dict.fromkeys(duplicates) if col in raw_columns and col not in CLEANED_COLUMNS]
+
+
+def compact_dtypes(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in FLOAT_COLUMNS:
+        df[col] = df[col].astype(np.float32)
+    for col in DATE_COLUMNS.values():
+        df[col] = df[col].astype('datetime64[ns]')
+    return df
+
+
+# Компактное представление: без сырых дублей, текст — категориями, вес — float32
+def compact_ledger(df, raw_columns):
+    df = df.drop(columns=raw_duplicate_columns(raw_columns))
+    return compact_dtypes(df)
+
+
+# Склейка компактных частей журнала по колонкам; категории объединяются,
+# а не превращаются обратно в строки
+def concat_ledger(pieces):
+    if len(pieces) == 1:
+        return pieces[0].reset_index(drop=True)
+
+    columns = list(pieces[0].columns)
+    data = {}
+    for col in columns:
+        parts = [piece.pop(col) for piece in pieces]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            data[col] = union_categoricals(parts)
+        else:
+            data[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(data, columns=columns)
+
+
+def memory_usage(df):
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,108 @@
+"""Фоновое обновление журнала, общее для всех сессий."""
+import os
+import threading
+from datetime import datetime
+
+REFRESH_INTERVAL = float(os.environ.get('YAKHROMA_REFRESH_INTERVAL', 300))
+FETCH_RETRIES = int(os.environ.get('YAKHROMA_FETCH_RETRIES', 3))
+RETRY_BACKOFF = float(os.environ.get('YAKHROMA_RETRY_BACKOFF', 2.0))
+
+
+class BackgroundRefresher:
+    """Периодически обновляет журнал в отдельном потоке.
+
+    Страница всегда читает последний успешный снимок (ledger.df), поэтому
+    медленная или упавшая выгрузка не задерживает отрисовку. Неудачная
+    попытка повторяется с экспоненциальной задержкой: backoff, 2·backoff, ...
+    """
+
+    def __init__(self, ledger, interval=REFRESH_INTERVAL, retries=FETCH_RETRIES,
+                 backoff=RETRY_BACKOFF, on_update=None):
+        self.ledger = ledger
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.on_update = on_update
+        self.last_success = None
+        self.last_error = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._refreshed = threading.Condition()
+        self._completed = 0
+        self._busy = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='yakhroma-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            self.refresh_once()
+            self._wakeup.wait(self.interval)
+
+    # Флаг _busy меняется под тем же условием, что и счётчик: refresh_now не
+    # должен застать обновление уже законченным, но ещё не посчитанным
+    def refresh_once(self):
+        with self._refreshed:
+            self._busy = True
+        try:
+            succeeded = self._refresh_with_retries()
+        finally:
+            with self._refreshed:
+                self._busy = False
+                self._completed += 1
+                self._refreshed.notify_all()
+
+        if succeeded and self.on_update is not None:
+            self.on_update()
+        return succeeded
+
+    def _refresh_with_retries(self):
+        for attempt in range(self.retries):
+            try:
+                self.ledger.refresh()
+            except Exception as e:
+                self.last_error = e
+                if attempt + 1 < self.retries and self._stopped.wait(self.backoff * 2 ** attempt):
+                    return False
+                continue
+
+            self.last_success = datetime.now()
+            self.last_error = None
+            return True
+        return False
+
+    # Внеочередное обновление; ждёт его завершения не дольше timeout секунд.
+    # Если обновление уже идёт, ждём следующее: текущее могло начаться до нажатия кнопки
+    def refresh_now(self, timeout=None):
+        with self._refreshed:
+            target = self._completed + (2 if self._busy else 1)
+            self._wakeup.set()
+            done = self._refreshed.wait_for(lambda: self._completed >= target, timeout)
+        return done and self.last_error is None
+
+    # Ждёт первого снимка (с диска или из источника) или первой неудачной попытки
+    def wait_for_snapshot(self, timeout=None):
+        with self._refreshed:
+            self._refreshed.wait_for(lambda: self.ledger.df is not None or self._completed > 0, timeout)
+        return self.ledger.df
+
+    # Время загрузки снимка, который сейчас видят пользователи. До первого
+    # успешного обновления — время сохранения кэша или сборки журнала
+    def loaded_at(self):
+        return self.last_success or self.ledger.cached_at or self.ledger.built_at
+
+    def age(self):
+        loaded_at = self.loaded_at()
+        if loaded_at is None:
+            return None
+        return datetime.now() - loaded_at
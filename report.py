@@ -0,0 +1,136 @@
+"""Отчёт по журналу причала без Streamlit: таблицы дашборда в файлы.
+
+    python report.py ledger.csv -o reports --format parquet
+    python report.py https://.../export?format=csv -o reports --period W --start 2024-01-01
+    python report.py Яхрома=yakhroma.csv Дмитров=dmitrov.csv -o reports --per-source
+
+Тот же конвейер, что у страницы: потоковое чтение выгрузки, очистка,
+компактный журнал и агрегаты. Несколько источников загружаются параллельно
+и сводятся в общий журнал (sources.MultiSourceLedger). Из кода доступны
+load_ledger, load_ledgers, build_report и write_tables.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from aggregates import compute_aggregates, top_clients
+from loader import CHUNK_SIZE, FETCH_TIMEOUT, IncrementalLedger, read_chunks
+from sources import MultiSourceLedger, SourceError, parse_sources
+from timeseries import PERIOD_LABELS
+
+TABLES = ['client_status', 'monthly_stats', 'top_clients', 'vessel_stats']
+FORMATS = ['csv', 'parquet', 'json']
+
+# Вес в журнале хранится во float32; тоннаж в отчёте округляется до килограмма,
+# иначе в файлы попадает шум вида 326.76000022888184
+TONNAGE_DECIMALS = 3
+
+
+def make_ledger(source, chunksize=CHUNK_SIZE, timeout=FETCH_TIMEOUT, cache_path=None):
+    return IncrementalLedger(source, fetch=lambda url: read_chunks(url, chunksize=chunksize, timeout=timeout),
+                             cache_path=cache_path)
+
+
+def load_ledger(source, chunksize=CHUNK_SIZE, timeout=FETCH_TIMEOUT):
+    return make_ledger(source, chunksize, timeout).refresh()
+
+
+# Несколько источников {имя: путь или URL}; возвращает MultiSourceLedger с общим журналом в df.
+# Отчёт не строится по части источников: любая ошибка поднимает SourceError
+def load_ledgers(sources, chunksize=CHUNK_SIZE, timeout=FETCH_TIMEOUT):
+    ledger = MultiSourceLedger(
+        sources, ledger_factory=lambda url, cache_path=None: make_ledger(url, chunksize, timeout, cache_path))
+    ledger.refresh()
+    if ledger.errors:
+        raise SourceError(ledger.errors)
+    return ledger
+
+
+# Аргумент «имя=адрес» или просто путь/URL; имя по умолчанию — имя файла без расширения
+def source_argument(value):
+    if '=' in value.split('?')[0]:
+        return parse_sources(value)
+    name = os.path.splitext(os.path.basename(value.split('?')[0].rstrip('/')))[0] or value
+    return {name: value}
+
+
+# Таблицы дашборда по журналу; динамика считается по периодам freq за [start, end].
+# Первый период, начатый до start, подписан датой start
+def build_report(df, freq='M', start=None, end=None, top=15, aggregates=None):
+    if aggregates is None:
+        aggregates = compute_aggregates(df)
+    tables = {
+        'client_status': aggregates['client_status'].reset_index(drop=True),
+        'monthly_stats': aggregates['dates'].period_stats(freq, start, end),
+        'top_clients': top_clients(aggregates['client_analysis'], limit=top).reset_index(drop=True),
+        'vessel_stats': aggregates['vessel_stats'].reset_index(drop=True),
+    }
+    return {name: table.round(TONNAGE_DECIMALS) for name, table in tables.items()}
+
+
+def write_table(table, path, fmt):
+    if fmt == 'csv':
+        table.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        table.to_parquet(path, index=False)
+    elif fmt == 'json':
+        table.to_json(path, orient='records', force_ascii=False, date_format='iso', indent=2)
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+
+# Пишет каждую таблицу в output_dir/<имя>.<формат>, возвращает список путей
+def write_tables(tables, output_dir, fmt='csv'):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = os.path.join(output_dir, f'{name}.{fmt}')
+        write_table(table, path, fmt)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', type=source_argument, metavar='source',
+                        help='CSV-выгрузка: путь к файлу или URL, для нескольких источников — имя=адрес')
+    parser.add_argument('--per-source', action='store_true',
+                        help='кроме общего отчёта, таблицы по каждому источнику в output-dir/<источник>')
+    parser.add_argument('-o', '--output-dir', default='reports')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='csv')
+    parser.add_argument('--period', choices=list(PERIOD_LABELS), default='M', help='период динамики: D, W или M')
+    parser.add_argument('--start', type=pd.Timestamp, help='начало диапазона дат динамики')
+    parser.add_argument('--end', type=pd.Timestamp, help='конец диапазона дат динамики')
+    parser.add_argument('--top', type=int, default=15, help='число клиентов в top_clients')
+    parser.add_argument('--tables', nargs='+', choices=TABLES, default=TABLES)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    sources = {}
+    for source in args.sources:
+        sources.update(source)
+    try:
+        ledger = load_ledgers(sources, chunksize=args.chunksize)
+    except Exception as e:
+        print(f"Ошибка загрузки: {e}", file=sys.stderr)
+        return 1
+
+    outputs = [(ledger.df, args.output_dir)]
+    if args.per_source and len(sources) > 1:
+        outputs += [(ledger.frame(name), os.path.join(args.output_dir, name)) for name in ledger.names]
+
+    print(f"Строк в журнале: {len(ledger.df)}")
+    for name, count in ledger.rejected.items():
+        if count:
+            print(f"Отклонено значений в колонке «{name}»: {count}", file=sys.stderr)
+    for df, output_dir in outputs:
+        tables = build_report(df, freq=args.period, start=args.start, end=args.end, top=args.top)
+        for path in write_tables({name: tables[name] for name in args.tables}, output_dir, args.format):
+            print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
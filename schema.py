@@ -0,0 +1,246 @@
+"""Схема выгрузки журнала: ожидаемые колонки, их названия и типы.
+
+Каждая колонка объявлена со списком допустимых названий (aliases) и типом
+значений. Заголовок выгрузки сопоставляется со схемой один раз: результат
+кэшируется по хешу заголовка, так что повторные обновления той же таблицы
+сопоставление не повторяют.
+
+Сопоставление сначала ищет точное совпадение названия, затем название как
+отдельные слова внутри заголовка («брутто, т», «клиент (получатель)»).
+Если под колонку подходят несколько заголовков, она считается
+несопоставленной, а не привязывается к первому попавшемуся. Заголовок,
+который подходит и обязательной, и необязательной колонке («брутто, тн»),
+достаётся обязательной; спорный заголовок двух обязательных колонок не
+достаётся ни одной. Без обязательной колонки выгрузка отклоняется
+(SchemaError) до разбора строк; необязательная колонка остаётся пустой и
+попадает в отчёт о схеме.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TEXT = 'text'
+DATE = 'date'
+FLOAT = 'float'
+
+
+def normalize_name(name):
+    return str(name).lower().replace('ё', 'е').replace('c', 'с').strip()
+
+
+# Ключ кэша сопоставления: хеш нормализованного заголовка
+def header_key(columns):
+    return hashlib.blake2b('\x1f'.join(columns).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SchemaError(ValueError):
+    """Заголовок выгрузки не сопоставляется со схемой."""
+
+    def __init__(self, resolution):
+        self.resolution = resolution
+        problems = []
+        if resolution.missing_required:
+            problems.append("нет колонок: " + ", ".join(resolution.missing_required))
+        for name, candidates in resolution.ambiguous_required.items():
+            problems.append(f"колонке «{name}» подходят несколько заголовков: "
+                            + ", ".join(f"«{header}»" for header in candidates))
+        for header, names in resolution.conflicts_required.items():
+            problems.append("колонки " + ", ".join(f"«{name}»" for name in names)
+                            + f" претендуют на один заголовок «{header}»")
+        super().__init__("Выгрузка не соответствует схеме: " + "; ".join(problems))
+
+
+class Column:
+    """Ожидаемая колонка выгрузки.
+
+    name — стандартное название в журнале, aliases — другие названия в
+    порядке предпочтения, kind — тип значений (TEXT, DATE, FLOAT), parsed —
+    колонка журнала с разобранными значениями, если она отличается от name.
+    """
+
+    def __init__(self, name, kind, aliases=(), required=True, parsed=None):
+        self.name = name
+        self.kind = kind
+        self.aliases = [normalize_name(alias) for alias in (name, *aliases)]
+        self.required = required
+        self.parsed = parsed or name
+        self._patterns = [re.compile(rf'(?<!\w){re.escape(alias)}(?!\w)') for alias in self.aliases]
+
+    # Заголовки, в которых одно из названий встречается отдельными словами;
+    # берутся совпадения по самому предпочтительному названию
+    def fuzzy_candidates(self, columns):
+        for pattern in self._patterns:
+            candidates = [col for col in columns if pattern.search(col)]
+            if candidates:
+                return candidates
+        return []
+
+
+class Resolution:
+    """Результат сопоставления заголовка со схемой.
+
+    mapping — стандартное название → заголовок выгрузки, только для
+    найденных колонок; missing — необязательные колонки, которых нет или
+    которые нельзя однозначно сопоставить; ambiguous — колонка → подходящие
+    ей заголовки; conflicts — заголовок → колонки, которым он подходит
+    одинаково; unused — заголовки, не попавшие в схему.
+    """
+
+    def __init__(self, key, mapping, missing, missing_required, ambiguous, conflicts, unused):
+        self.key = key
+        self.mapping = mapping
+        self.missing = missing
+        self.missing_required = missing_required
+        self.ambiguous = ambiguous
+        self.conflicts = conflicts
+        self.unused = unused
+
+    @property
+    def ok(self):
+        return not self.missing_required and not self.ambiguous_required and not self.conflicts_required
+
+    @property
+    def ambiguous_required(self):
+        return {name: candidates for name, candidates in self.ambiguous.items() if name not in self.missing}
+
+    # Спорные заголовки обязательных колонок (необязательные от них уже отказались)
+    @property
+    def conflicts_required(self):
+        return {header: names for header, names in self.conflicts.items()
+                if not set(names) & set(self.missing)}
+
+    # Заголовки выгрузки в порядке колонок схемы
+    @property
+    def columns(self):
+        return list(self.mapping.values())
+
+
+class Schema:
+    """Набор ожидаемых колонок, кэш сопоставлений и проверка значений.
+
+    Отклонённое значение — непустая ячейка колонки типа DATE или FLOAT,
+    которую не удалось разобрать (или вес вида inf). Отметки об отклонённых
+    значениях хранятся по строке одним байтом: бит на проверяемую колонку.
+    """
+
+    def __init__(self, columns, cache_size=32):
+        self.columns = list(columns)
+        self.by_name = {column.name: column for column in self.columns}
+        self.validated = [column.name for column in self.columns if column.kind in (DATE, FLOAT)]
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    def names_of(self, kind):
+        return [column.name for column in self.columns if column.kind == kind]
+
+    # Сопоставление заголовка; без обязательных колонок поднимает SchemaError
+    def resolve(self, columns):
+        columns = [str(col) for col in columns]
+        key = header_key(columns)
+        with self._lock:
+            resolution = self._cache.get(key)
+            if resolution is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if resolution is None:
+            resolution = self._resolve(key, columns)
+            with self._lock:
+                self._cache[key] = resolution
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        if not resolution.ok:
+            raise SchemaError(resolution)
+        return resolution
+
+    def _resolve(self, key, columns):
+        found = {}
+        claimed = set()
+
+        # Точные совпадения занимают заголовки раньше совпадений по словам
+        for column in self.columns:
+            for alias in column.aliases:
+                if alias in columns and alias not in claimed:
+                    found[column.name] = alias
+                    claimed.add(alias)
+                    break
+
+        # Совпадения по словам ищутся для всех колонок сразу: заголовок,
+        # подходящий нескольким колонкам, не достаётся первой из них
+        unclaimed = [col for col in columns if col not in claimed]
+        candidates = {column.name: column.fuzzy_candidates(unclaimed)
+                      for column in self.columns if column.name not in found}
+        wanted = {}
+        for name, headers in candidates.items():
+            for header in headers:
+                wanted.setdefault(header, []).append(name)
+
+        # Заголовок, нужный обязательной колонке, необязательные не оспаривают
+        for header, names in wanted.items():
+            required = [name for name in names if self.by_name[name].required]
+            if required and len(required) < len(names):
+                for name in names:
+                    if name not in required:
+                        candidates[name].remove(header)
+                wanted[header] = required
+
+        ambiguous = {}
+        conflicts = {}
+        for name, headers in candidates.items():
+            if len(headers) > 1:
+                ambiguous[name] = headers
+            elif headers and len(wanted[headers[0]]) > 1:
+                conflicts[headers[0]] = wanted[headers[0]]
+            elif headers:
+                found[name] = headers[0]
+                claimed.add(headers[0])
+
+        contested = {name for names in conflicts.values() for name in names}
+        missing = [column.name for column in self.columns if column.name not in found]
+        return Resolution(
+            key=key,
+            mapping={name: found[name] for name in self.names if name in found},
+            missing=[name for name in missing if not self.by_name[name].required],
+            missing_required=[name for name in missing if self.by_name[name].required
+                              and name not in ambiguous and name not in contested],
+            ambiguous=ambiguous,
+            conflicts=conflicts,
+            unused=[col for col in columns if col not in claimed],
+        )
+
+    # Отметки отклонённых значений части журнала: {колонка: bool-массив} → байт на строку
+    def pack_rejected(self, rejected, n_rows):
+        flags = np.zeros(n_rows, dtype=np.uint8)
+        for bit, name in enumerate(self.validated):
+            if name in rejected:
+                flags |= np.asarray(rejected[name], dtype=np.uint8) << bit
+        return flags
+
+    def rejected_counts(self, flags):
+        return {name: int(np.count_nonzero(flags & (1 << bit))) for bit, name in enumerate(self.validated)}
+
+
+LEDGER_SCHEMA = Schema([
+    Column('судно', TEXT, aliases=['название судна', 'теплоход']),
+    Column('дата принятия на пирс', DATE, aliases=['дата принятия', 'дата приемки', 'принято на пирс'],
+           parsed='дата_принятия_на_пирс'),
+    Column('дата отгрузки авто', DATE, aliases=['дата отгрузки', 'отгружено на авто'],
+           parsed='дата_отгрузки_авто'),
+    Column('перевозчик', TEXT, aliases=['транспортная компания'], required=False),
+    Column('номер авто', TEXT, aliases=['госномер', 'гос. номер', 'номер машины'], required=False),
+    Column('тн', TEXT, aliases=['тн №', '№ тн', 'транспортная накладная'], required=False),
+    Column('клиент', TEXT, aliases=['грузополучатель', 'заказчик']),
+    Column('№ сертиф.', TEXT, aliases=['№ сертификата', 'сертификат'], required=False),
+    Column('брутто', FLOAT, aliases=['вес брутто', 'масса брутто']),
+])
@@ -0,0 +1,272 @@
+"""Несколько выгрузок (причалов, сезонов) в одном журнале.
+
+Реестр источников задаётся переменной окружения или файлом:
+
+    YAKHROMA_SOURCES="Яхрома=https://...export?format=csv;Дмитров=/data/dmitrov.csv"
+    YAKHROMA_SOURCES_FILE=sources.json   # {"Яхрома": "https://...", "Дмитров": "/data/dmitrov.csv"}
+
+Без них источник один — YAKHROMA_SOURCE_URL.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import StageLog
+from inventory import PierSnapshot
+from loader import SOURCE_URL, IncrementalLedger
+from memo import FINGERPRINT_ATTR
+from processing import concat_ledger, memory_usage
+
+SOURCE_COLUMN = 'источник'
+DEFAULT_SOURCE_NAME = 'Яхрома'
+
+# Выгрузки загружаются и очищаются параллельно, по потоку на источник
+LOAD_WORKERS = int(os.environ.get('YAKHROMA_LOAD_WORKERS', 4))
+
+
+def parse_sources(text):
+    sources = {}
+    for item in text.split(';'):
+        if not item.strip():
+            continue
+        name, sep, url = item.partition('=')
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f"Источник должен быть задан как имя=адрес: {item!r}")
+        sources[name.strip()] = url.strip()
+    return sources
+
+
+def read_sources_file(path):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        return {item['name']: item['url'] for item in config}
+    return dict(config)
+
+
+# Реестр источников: имя → путь или URL выгрузки, в порядке объявления
+def load_sources(environ=os.environ):
+    if environ.get('YAKHROMA_SOURCES_FILE'):
+        sources = read_sources_file(environ['YAKHROMA_SOURCES_FILE'])
+    elif environ.get('YAKHROMA_SOURCES'):
+        sources = parse_sources(environ['YAKHROMA_SOURCES'])
+    else:
+        sources = {DEFAULT_SOURCE_NAME: SOURCE_URL}
+    if not sources:
+        raise ValueError("Реестр источников пуст")
+    return sources
+
+
+# Единственный источник пользуется прежним файлом кэша, у нескольких — свой файл на каждый
+def source_cache_path(name, cache_path, several):
+    if not cache_path or not several:
+        return cache_path
+    root, ext = os.path.splitext(cache_path)
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=4).hexdigest()
+    return f'{root}-{digest}{ext}'
+
+
+class SourceError(Exception):
+    """Источники не обновились: errors — имя источника → ошибка."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f'{name}: {error}' for name, error in errors.items()))
+
+
+class MultiSourceLedger:
+    """Журналы нескольких источников и их объединение.
+
+    Каждый источник — отдельный IncrementalLedger со своим кэшем и
+    обновлением по разнице. refresh() обновляет их параллельно в пуле
+    потоков и сводит в общий журнал: строки помечаются категориальной
+    колонкой «источник», категории клиентов и судов объединяются
+    (union_categoricals), итоги по причалу складываются из итогов
+    источников. В общий журнал идут колонки, которые есть у всех
+    источников. Если ни один снимок не изменился, общий журнал не
+    пересобирается.
+
+    Если не обновилась часть источников, обновление считается успешным: в
+    общий журнал идут их последние снимки (если они были), а ошибки лежат в
+    errors до следующего обновления. SourceError поднимается, только когда
+    не обновился ни один источник.
+
+    Этапы обновления каждого источника лежат во вложенных журналах
+    stages.children: их время уже входит в этап 'sources' и в итог не
+    добавляется.
+
+    Интерфейс совпадает с IncrementalLedger (df, pier, stages, ...), поэтому
+    фоновое обновление и страница работают с ним так же. Строки не хранятся
+    дважды: после сборки снимки источников заменяются срезами общего журнала
+    (IncrementalLedger.share_frame), а один источник и вовсе не копируется —
+    общий журнал — это его собственный снимок.
+    """
+
+    def __init__(self, sources, cache_path=None, workers=LOAD_WORKERS, ledger_factory=IncrementalLedger):
+        several = len(sources) > 1
+        self.sources = {
+            name: ledger_factory(url, cache_path=source_cache_path(name, cache_path, several))
+            for name, url in sources.items()
+        }
+        self.workers = workers
+        self.df = None
+        self.pier = None
+        self.stages = None
+        self.errors = {}
+        self.built_at = None
+        self.memory_before = None
+        self.memory_after = None
+        self._merged = None
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return list(self.sources)
+
+    @property
+    def changed_rows(self):
+        return sum(ledger.changed_rows for ledger in self.sources.values())
+
+    # Все источники сверены с выгрузкой, кроме тех, что не обновились в последний раз
+    @property
+    def validated(self):
+        return all(ledger.validated or name in self.errors for name, ledger in self.sources.items())
+
+    @property
+    def rejected(self):
+        totals = {}
+        for ledger in self.sources.values():
+            for name, count in ledger.rejected.items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    @property
+    def cached_at(self):
+        times = [ledger.cached_at for ledger in self.sources.values() if ledger.cached_at is not None]
+        return min(times) if times else None
+
+    def load_cache(self):
+        loaded = [ledger.load_cache() for ledger in self.sources.values()]
+        if any(loaded):
+            with self._lock:
+                self._merge()
+        return any(loaded)
+
+    def refresh(self):
+        log = StageLog('refresh')
+        errors = {}
+        with log.stage('sources'):
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(self.sources))),
+                                    thread_name_prefix='yakhroma-source') as pool:
+                futures = {name: pool.submit(ledger.refresh) for name, ledger in self.sources.items()}
+                for name, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors[name] = e
+
+        # Этапы каждого источника — вложенными журналами под его именем
+        for name, ledger in self.sources.items():
+            if ledger.stages is not None and name not in errors:
+                log.nest(name, ledger.stages)
+
+        with self._lock:
+            with log.stage('merge'):
+                self._merge()
+            self.stages = log.finish()
+            self.errors = errors
+        if len(errors) == len(self.sources):
+            raise SourceError(errors)
+        return self.df
+
+    def _merge(self):
+        loaded = {name: ledger for name, ledger in self.sources.items() if ledger.df is not None}
+        merged = tuple(f'{name}:{ledger.df.attrs.get(FINGERPRINT_ATTR)}' for name, ledger in loaded.items())
+        if not loaded or merged == self._merged:
+            return
+        self.built_at = datetime.now()
+        self.memory_before = sum(ledger.memory_before or 0 for ledger in loaded.values())
+
+        if len(self.sources) == 1:
+            ledger = next(iter(loaded.values()))
+            self.memory_after = ledger.memory_after
+            self.pier = ledger.pier_snapshot(ledger.df)
+            self.df = ledger.df
+            self._merged = merged
+            return
+
+        frames = [ledger.df for ledger in loaded.values()]
+        shared = set.intersection(*(set(frame.columns) for frame in frames))
+        columns = [col for col in frames[0].columns if col in shared]
+        pieces = []
+        for name, frame in zip(loaded, frames):
+            # concat_ledger забирает колонки из частей, поэтому журнал источника
+            # не передаётся сам: при тех же колонках берётся поверхностная копия
+            # без копирования данных, а выбор колонок и так копирует их
+            piece = frame.copy(deep=False) if list(frame.columns) == columns else frame[columns]
+            piece[SOURCE_COLUMN] = pd.Categorical.from_codes(
+                np.full(len(frame), self.names.index(name), dtype=np.int8), categories=self.names)
+            pieces.append(piece)
+        df = concat_ledger(pieces)
+        df.attrs[FINGERPRINT_ATTR] = hashlib.blake2b('\x1f'.join(merged).encode('utf-8'), digest_size=16).hexdigest()
+
+        # Журналы источников становятся срезами строк общего журнала. Выбор
+        # колонок среза копирует данные, поэтому колонка «источник» удаляется
+        # из готового среза, а источник с собственными колонками остаётся как есть
+        start = 0
+        for ledger, frame in zip(loaded.values(), frames):
+            end = start + len(frame)
+            if set(frame.columns) == shared:
+                view = df.iloc[start:end]
+                del view[SOURCE_COLUMN]
+                ledger.share_frame(view, frame.attrs.get(FINGERPRINT_ATTR))
+            start = end
+
+        self.memory_after = memory_usage(df)
+        self.pier = self._merge_pier(loaded.values(), df.attrs[FINGERPRINT_ATTR])
+        self.df = df
+        self._merged = merged
+
+    @staticmethod
+    def _merge_pier(ledgers, fingerprint):
+        return PierSnapshot.merge([ledger.pier_snapshot(ledger.df) for ledger in ledgers], fingerprint)
+
+    # Журнал одного источника или общий (name=None)
+    def frame(self, name=None):
+        if name is None:
+            return self.df
+        return self.sources[name].df
+
+    # Общий журнал и журналы источников, которые сейчас отдаёт загрузчик
+    def frames(self):
+        frames = [self.df] + [ledger.df for ledger in self.sources.values()]
+        return [df for df in frames if df is not None]
+
+    # Отчёт о схеме по каждому источнику (см. IncrementalLedger.schema_report)
+    def schema_report(self):
+        reports = {name: ledger.schema_report() for name, ledger in self.sources.items()}
+        reports = {name: report for name, report in reports.items() if report is not None}
+        if not reports:
+            return None
+        if len(self.sources) == 1:
+            return next(iter(reports.values()))
+        return pd.concat([report.assign(**{SOURCE_COLUMN: name}) for name, report in reports.items()],
+                         ignore_index=True)
+
+    # Итоги по причалу для снимка df одного источника или общего журнала
+    def pier_snapshot(self, df, name=None):
+        if name is not None:
+            return self.sources[name].pier_snapshot(df)
+        pier = self.pier
+        if pier is not None and pier.fingerprint == df.attrs.get(FINGERPRINT_ATTR):
+            return pier
+        if len(self.sources) == 1:
+            return next(iter(self.sources.values())).pier_snapshot(df)
+        loaded = [ledger for ledger in self.sources.values() if ledger.df is not None]
+        return self._merge_pier(loaded, df.attrs.get(FINGERPRINT_ATTR))
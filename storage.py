@@ -0,0 +1,60 @@
+"""Постоянный кэш обработанного журнала в формате Parquet."""
+import json
+import os
+from datetime import datetime
+
+# Увеличивается при любом изменении состава или типов колонок после очистки
+SCHEMA_VERSION = 4
+
+CACHE_PATH = os.environ.get(
+    'YAKHROMA_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ledger.parquet'),
+)
+
+HASH_COLUMN = '__row_hash'
+REJECTED_COLUMN = '__rejected'
+METADATA_KEY = b'yakhroma'
+
+
+def save_snapshot(df, hashes, rejected, columns, source, path=CACHE_PATH):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df.assign(**{HASH_COLUMN: hashes, REJECTED_COLUMN: rejected}), preserve_index=False)
+    stamp = {
+        'schema_version': SCHEMA_VERSION,
+        'columns': columns,
+        'source': source,
+        'saved_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps(stamp, ensure_ascii=False).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    # Запись через временный файл, чтобы читатели не увидели недописанный снимок
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Возвращает (df, hashes, rejected, stamp) или None, если кэша нет или он от другой схемы/источника
+def load_snapshot(source, path=CACHE_PATH):
+    if not os.path.exists(path):
+        return None
+
+    try:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, memory_map=True)
+        stamp = json.loads(table.schema.metadata[METADATA_KEY].decode('utf-8'))
+        if stamp.get('schema_version') != SCHEMA_VERSION or stamp.get('source') != source:
+            return None
+
+        df = table.to_pandas()
+        hashes = df.pop(HASH_COLUMN).to_numpy()
+        rejected = df.pop(REJECTED_COLUMN).to_numpy()
+    except Exception:
+        # Повреждённый файл кэша не должен мешать старту: журнал загрузится из источника
+        return None
+    return df, hashes, rejected, stamp
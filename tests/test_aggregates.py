@@ -0,0 +1,74 @@
+"""Агрегаты по кодам статуса дают те же итоги, что и прежние фильтры, группировки и merge."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import STATUS_COLUMNS, compute_aggregates, top_clients
+from benchmarks.synthetic import generate_ledger
+from processing import clean_data, compact_ledger, map_columns, normalize_column_names
+
+
+# Прежний расчёт страницы: отдельная копия журнала на каждый статус и merge итогов
+def reference_aggregates(df):
+    shipped = df[df['дата_отгрузки_авто'].notna()]
+    on_pier = df[(df['дата_принятия_на_пирс'].notna()) & (df['дата_отгрузки_авто'].isna())]
+    in_transit = df[(df['дата_принятия_на_пирс'].isna()) & (df['дата_отгрузки_авто'].isna())]
+
+    shipped_agg = shipped.groupby('клиент')['брутто'].sum().rename('отгружено').reset_index()
+    on_pier_agg = on_pier.groupby('клиент')['брутто'].sum().rename('на_причале').reset_index()
+    in_transit_agg = in_transit.groupby('клиент')['брутто'].sum().rename('в_транзите').reset_index()
+
+    client_status = pd.DataFrame({'клиент': df['клиент'].unique()})
+    client_status = client_status.merge(shipped_agg, on='клиент', how='left') \
+        .merge(on_pier_agg, on='клиент', how='left') \
+        .merge(in_transit_agg, on='клиент', how='left') \
+        .fillna(0)
+    client_status['всего'] = client_status['отгружено'] + client_status['на_причале'] + client_status['в_транзите']
+
+    client_analysis = shipped.groupby('клиент').agg({'брутто': 'sum', '№ сертиф.': 'count'}).reset_index()
+    client_analysis.columns = ['клиент', 'общий_вес', 'количество_мест']
+
+    totals = [shipped['брутто'].sum(), on_pier['брутто'].sum(), in_transit['брутто'].sum()]
+    return totals, client_status, client_analysis
+
+
+def by_client(table):
+    return table.sort_values('клиент', ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def cleaned():
+    raw = normalize_column_names(generate_ledger(100_000, seed=4))
+    return raw.columns, clean_data(map_columns(raw))
+
+
+def test_matches_reference_pipeline(cleaned):
+    columns, df = cleaned
+    totals, client_status, client_analysis = reference_aggregates(df)
+    # Страница считает по компактному журналу: вес во float32
+    aggregates = compute_aggregates(compact_ledger(df.copy(), list(columns)))
+
+    assert aggregates['status_totals'] == pytest.approx(totals, rel=1e-5)
+
+    actual = aggregates['client_status']
+    assert actual['всего'].is_monotonic_decreasing
+    actual = by_client(actual.astype({'клиент': object}))
+    expected = by_client(client_status)
+    assert actual['клиент'].tolist() == expected['клиент'].tolist()
+    for col in STATUS_COLUMNS + ['всего']:
+        np.testing.assert_allclose(actual[col], expected[col], rtol=1e-5)
+
+    actual = aggregates['client_analysis']
+    assert actual['общий_вес'].is_monotonic_decreasing
+    actual = by_client(actual)
+    expected = by_client(client_analysis)
+    assert actual['клиент'].tolist() == expected['клиент'].tolist()
+    assert actual['количество_мест'].tolist() == expected['количество_мест'].tolist()
+    np.testing.assert_allclose(actual['общий_вес'], expected['общий_вес'], rtol=1e-5)
+
+
+def test_top_clients_skip_zero_tonnage():
+    analysis = pd.DataFrame({'клиент': ['А', 'Б', 'В'], 'общий_вес': [5.0, 0.0, 3.0],
+                             'количество_мест': [2, 1, 1]})
+    assert top_clients(analysis, limit=5)['клиент'].tolist() == ['А', 'В']
+    assert top_clients(analysis, limit=1)['клиент'].tolist() == ['А']
@@ -0,0 +1,71 @@
+"""Генератор синтетической выгрузки и замеры конвейера."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.compare import compare
+from benchmarks.run import run_benchmarks
+from benchmarks.sessions import check_thresholds, wave_result
+from benchmarks.synthetic import HEADER, generate_ledger, make_clients, write_ledger
+
+STAGES = ['fetch', 'normalize', 'parse', 'compact', 'aggregate', 'inventory', 'query', 'figures',
+          'refresh_cold', 'refresh_unchanged']
+
+
+def test_generator_is_deterministic_and_realistic():
+    ledger = generate_ledger(20_000, seed=3)
+    pd.testing.assert_frame_equal(ledger, generate_ledger(20_000, seed=3))
+    assert list(ledger.columns) == HEADER
+
+    # Кругорейсы «Название (N)», десятичная запятая, пустые ячейки, даты в разных форматах
+    assert ledger['Судно'].str.fullmatch(r'.+ \(\d+\)').any()
+    assert ledger['Брутто'].str.fullmatch(r'\d+,\d{3}').mean() > 0.8
+    assert (ledger['Брутто'] == '').any() and (ledger['Дата отгрузки авто'] == '').any()
+    assert ledger['Дата принятия на пирс'].str.fullmatch(r'\d{4}-\d{2}-\d{2}').any()
+    assert ledger['Дата принятия на пирс'].str.fullmatch(r'\d{2}\.\d{2}\.\d{4}').mean() > 0.8
+
+
+def test_parts_share_catalogs(tmp_path):
+    path = write_ledger(str(tmp_path / 'ledger.csv'), 2_500, seed=1, chunk_size=1_000)
+    ledger = pd.read_csv(path, dtype=str, keep_default_na=False)
+
+    assert len(ledger) == 2_500
+    assert ledger['№ Сертиф.'].is_unique
+    # Клиенты всех частей берутся из одного справочника, который зависит только от seed
+    assert set(ledger['Клиент']) <= set(make_clients(300, np.random.default_rng(1)))
+
+
+def test_run_and_compare(tmp_path):
+    report = run_benchmarks([1_000], trace_memory=False, data_dir=str(tmp_path), log=lambda *args: None)
+    assert [row['stage'] for row in report['results']] == STAGES
+    assert all(row['seconds'] > 0 for row in report['results'])
+
+    base = {(row['rows'], row['stage']): row for row in report['results']}
+    head = {key: dict(row) for key, row in base.items()}
+    head[(1_000, 'parse')]['seconds'] = max(base[(1_000, 'parse')]['seconds'] * 2, 0.1)
+
+    _, regressions = compare(base, head, threshold=0.2)
+    assert regressions == [((1_000, 'parse'), ['время'])]
+    assert compare(base, base, threshold=0.2)[1] == []
+
+
+def test_session_thresholds():
+    results = [wave_result(0, 1, [0.1] * 20, 1.0, 200 * 2**20),
+               wave_result(0, 10, [0.2] * 20, 1.0, 210 * 2**20),
+               wave_result(1, 10, [0.2] * 18 + [3.0] * 2, 1.0, 260 * 2**20)]
+    assert results[-1]['p50_seconds'] == pytest.approx(0.2)
+    assert results[-1]['p95_seconds'] > 0.2 and results[-1]['max_seconds'] == 3.0
+
+    assert check_thresholds(results) == []
+    assert check_thresholds(results, max_p95=5, max_rss_growth=60) == []
+    failures = check_thresholds(results, max_p95=0.5, max_rss_growth=40)
+    assert len(failures) == 2
+    assert failures[0].startswith('обновление 1, сессий 10: p95')
+    assert 'вырос на 50.0 МБ' in failures[1]
+
+
+def test_rss_threshold_without_proc():
+    results = [wave_result(0, 1, [0.1], 1.0, None), wave_result(1, 1, [0.1], 1.0, None)]
+    assert check_thresholds(results, max_p95=1) == []
+    assert check_thresholds(results, max_rss_growth=10) == [
+        'RSS сервера не замерен (нужен Linux с /proc), порог роста RSS не проверен']
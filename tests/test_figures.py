@@ -0,0 +1,53 @@
+"""Графики: хвост категорий в «прочих», WebGL для длинных линий, цветовая шкала."""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from figures import (CATEGORY_LIMIT, OTHERS_LABEL, WEBGL_THRESHOLD, cap_categories, clients_figure,
+                     pier_stock_figure, unique_clients_figure)
+
+
+def test_cap_keeps_total():
+    rng = np.random.default_rng(0)
+    labels = np.array([f'клиент {i}' for i in range(50)], dtype=object)
+    values = rng.random((50, 3)) * 100
+
+    capped, capped_values = cap_categories(labels, values)
+    assert len(capped) == CATEGORY_LIMIT + 1 and capped[-1] == OTHERS_LABEL
+    np.testing.assert_allclose(capped_values.sum(axis=0), values.sum(axis=0))
+    head = capped_values[:-1].sum(axis=1)
+    assert (np.diff(head) <= 0).all() and head[-1] >= np.sort(values.sum(axis=1))[-CATEGORY_LIMIT]
+
+    # Одна лишняя категория не складывается в «прочие»
+    capped, capped_values = cap_categories(labels[:CATEGORY_LIMIT + 1], values[:CATEGORY_LIMIT + 1, 0])
+    assert OTHERS_LABEL not in capped
+    assert capped_values.sum() == values[:CATEGORY_LIMIT + 1, 0].sum()
+
+
+def test_clients_figure_keeps_total():
+    client_status = pd.DataFrame({'клиент': [f'к{i}' for i in range(40)],
+                                  'отгружено': np.arange(40.0), 'на_причале': 1.0, 'в_транзите': 0.0})
+    figure = clients_figure(client_status)
+    assert sum(np.sum(trace.y) for trace in figure.data) == client_status[['отгружено', 'на_причале']].sum().sum()
+    assert list(figure.layout.xaxis.categoryarray)[-1] == OTHERS_LABEL
+
+
+def test_webgl_from_threshold():
+    def stats(n):
+        return pd.DataFrame({'день': np.arange(n).astype(str), 'уникальных_клиентов': np.ones(n, dtype=int)})
+
+    assert isinstance(unique_clients_figure(stats(WEBGL_THRESHOLD - 1), '').data[0], go.Scatter)
+    assert isinstance(unique_clients_figure(stats(WEBGL_THRESHOLD), '').data[0], go.Scattergl)
+
+
+def test_pier_stock_others_outside_color_scale():
+    stock = pd.DataFrame({'клиент': [f'к{i}' for i in range(30)],
+                          'тоннаж': np.arange(30.0, 0, -1), 'мест': np.arange(30) % 4 + 1})
+    figure = pier_stock_figure(stock, 'клиент')
+    ranked, others = figure.data
+
+    assert list(ranked.y) == stock['клиент'].head(15).tolist()
+    assert max(ranked.marker.color) == stock['мест'].head(15).max()
+    assert list(others.y) == [OTHERS_LABEL]
+    assert others.x[0] == stock['тоннаж'].iloc[15:].sum()
+    assert sum(ranked.x) + others.x[0] == stock['тоннаж'].sum()
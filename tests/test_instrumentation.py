@@ -0,0 +1,83 @@
+"""Замеры этапов, метрики и профилирование."""
+import builtins
+import json
+
+from instrumentation import MetricsSink, StageLog, current_rss, profile_report, start_profiler
+
+
+def test_stages_with_same_name_add_up():
+    log = StageLog('refresh')
+    for _ in range(3):
+        with log.stage('parse'):
+            pass
+    items = list(log.iterate('fetch', [1, 2]))
+
+    assert items == [1, 2]
+    assert log.stages['parse']['calls'] == 3
+    # Ожидание каждой части и конец итератора
+    assert log.stages['fetch']['calls'] == 3
+    assert log.total() == sum(record['seconds'] for record in log.stages.values())
+
+
+def test_checkpoints_close_previous_stage():
+    log = StageLog('page')
+    log.checkpoint('load')
+    log.checkpoint('aggregate')
+    log.finish()
+    assert [record['stage'] for record in log.records()] == ['load', 'aggregate']
+
+
+def test_disabled_log_measures_nothing():
+    log = StageLog('page', enabled=False)
+    first, second = log.stage('a'), log.stage('b')
+    with first:
+        pass
+    log.checkpoint('c')
+    log.finish()
+
+    assert first is second
+    assert log.stages == {}
+
+
+def test_rss_without_proc(monkeypatch):
+    real_open = builtins.open
+
+    def no_proc(path, *args, **kwargs):
+        if str(path).startswith('/proc/'):
+            raise OSError(path)
+        return real_open(path, *args, **kwargs)
+
+    assert current_rss() > 0
+    monkeypatch.setattr(builtins, 'open', no_proc)
+    assert current_rss() == 0
+
+
+def test_sink_writes_json_lines_and_prometheus(tmp_path):
+    log_path, prom_path = tmp_path / 'metrics.jsonl', tmp_path / 'metrics.prom'
+    sink = MetricsSink(str(log_path), str(prom_path))
+    log = StageLog('refresh')
+    log.add('fetch', 0.5, 1024)
+    sink.record(log.finish(), memo_hits_total=3, ledger_rows=10)
+
+    entry = json.loads(log_path.read_text(encoding='utf-8'))
+    assert entry['scope'] == 'refresh' and entry['memo_hits_total'] == 3
+    prom = prom_path.read_text(encoding='utf-8')
+    assert 'yakhroma_stage_seconds{scope="refresh",stage="fetch"} 0.500000' in prom
+    assert '# TYPE yakhroma_memo_hits_total counter' in prom
+    assert '# TYPE yakhroma_ledger_rows gauge' in prom
+
+
+def test_sink_without_paths_is_disabled(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sink = MetricsSink(None, None)
+    sink.record(StageLog('page'), memo_hits_total=1)
+    assert not sink.enabled
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile_report_lists_functions():
+    profiler = start_profiler()
+    sorted(range(1000), key=lambda value: -value)
+    profiler.disable()
+    report = profile_report(profiler, limit=5)
+    assert 'cumtime' in report and '<lambda>' in report
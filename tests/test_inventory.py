@@ -0,0 +1,83 @@
+"""Груз на причале и сроки хранения: инкрементальные итоги против прямого расчёта."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_ledger
+from inventory import PierInventory, PierSnapshot
+from processing import clean_data, map_columns, normalize_column_names
+
+TODAY = pd.Timestamp('2025-03-01')
+
+
+def ledger(rows, part=0):
+    return clean_data(map_columns(normalize_column_names(generate_ledger(rows, seed=2, part=part))))
+
+
+def built(df):
+    inventory = PierInventory()
+    inventory.rebuild(df)
+    return inventory.snapshot()
+
+
+def assert_same(snapshot, expected):
+    pd.testing.assert_frame_equal(snapshot.stock_by_client().sort_values('клиент', ignore_index=True),
+                                  expected.stock_by_client().sort_values('клиент', ignore_index=True))
+    pd.testing.assert_frame_equal(snapshot.stock_by_vessel().sort_values('судно', ignore_index=True),
+                                  expected.stock_by_vessel().sort_values('судно', ignore_index=True))
+    pd.testing.assert_frame_equal(snapshot.dwell_histogram(), expected.dwell_histogram())
+    pd.testing.assert_frame_equal(snapshot.ageing(TODAY), expected.ageing(TODAY))
+    assert snapshot.total() == pytest.approx(expected.total())
+    assert snapshot.dwell_percentiles() == expected.dwell_percentiles()
+
+
+@pytest.fixture(scope='module')
+def df():
+    return ledger(20_000)
+
+
+def test_totals_match_direct_calculation(df):
+    snapshot = built(df)
+    weight = df['брутто'].fillna(0.0)
+    on_pier = df['дата_принятия_на_пирс'].notna() & df['дата_отгрузки_авто'].isna()
+
+    expected = weight[on_pier].groupby(df['клиент'][on_pier]).agg(['sum', 'size'])
+    stock = snapshot.stock_by_client().set_index('клиент').loc[expected.index]
+    np.testing.assert_allclose(stock['тоннаж'], expected['sum'], rtol=1e-5)
+    np.testing.assert_array_equal(stock['мест'], expected['size'])
+    assert snapshot.total()[1] == on_pier.sum()
+
+    dwell = (df['дата_отгрузки_авто'] - df['дата_принятия_на_пирс']).dt.days.dropna()
+    dwell = dwell[dwell >= 0].astype(int)
+    assert snapshot.dwell_histogram()['мест'].sum() == len(dwell)
+    assert snapshot.dwell_percentiles()[50] == int(np.sort(dwell)[int(np.ceil(len(dwell) * 0.5)) - 1])
+
+    ages = (TODAY - df['дата_принятия_на_пирс'][on_pier]).dt.days
+    tonnage, places = snapshot.older_than(30, TODAY)
+    assert places == (ages > 30).sum()
+    assert tonnage == pytest.approx(weight[on_pier][ages > 30].sum(), rel=1e-5)
+
+
+def test_update_matches_rebuild(df):
+    inventory = PierInventory()
+    inventory.rebuild(df)
+
+    # Отгрузка со склада, правка веса, дописанные строки
+    edited = pd.concat([df, ledger(500, part=1)], ignore_index=True)
+    on_pier = np.flatnonzero(edited['дата_принятия_на_пирс'].notna() & edited['дата_отгрузки_авто'].isna())[:50]
+    edited.loc[on_pier, 'дата_отгрузки_авто'] = TODAY
+    edited.loc[7, 'брутто'] = 123.0
+    changed = np.concatenate([on_pier, [7], np.arange(len(df), len(edited))])
+    inventory.update(edited, changed)
+    assert_same(inventory.snapshot(), built(edited))
+
+    # Строки, пропавшие из конца выгрузки
+    truncated = edited.iloc[:15_000]
+    inventory.update(truncated, np.array([], dtype=np.int64))
+    assert_same(inventory.snapshot(), built(truncated))
+
+
+def test_merge_matches_combined_ledger(df):
+    other = ledger(5_000, part=3)
+    merged = PierSnapshot.merge([built(df), built(other)])
+    assert_same(merged, built(pd.concat([df, other], ignore_index=True)))
@@ -0,0 +1,164 @@
+"""Загрузка выгрузки по частям, обновление по разнице и кэш на диске."""
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from benchmarks.run import BENCH_DIR, ROOT
+from benchmarks.synthetic import ensure_ledger, generate_ledger
+from loader import IncrementalLedger, read_chunks
+
+# Замер пикового RSS на большой выгрузке (2 млн строк — около 230 МБ CSV в
+# .cache и до 1 ГБ памяти) включается явно: YAKHROMA_TEST_LARGE_ROWS=2000000
+LARGE_ROWS = int(os.environ.get('YAKHROMA_TEST_LARGE_ROWS', 0))
+
+# Полная загрузка выгрузки в отдельном процессе: пиковый RSS процесса не
+# зависит от того, что успели выделить другие тесты
+PEAK_SCRIPT = """
+import json, resource, sys
+from loader import IncrementalLedger, read_chunks
+path, chunksize = sys.argv[1], int(sys.argv[2])
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+ledger = IncrementalLedger(path, fetch=lambda url: read_chunks(url, chunksize=chunksize))
+ledger.refresh()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(json.dumps({'growth': peak - base, 'ledger': ledger.memory_after, 'rows': len(ledger.df)}))
+"""
+
+
+def write_csv(path, rows, seed=0, part=0):
+    generate_ledger(rows, seed=seed, part=part).to_csv(path, index=False)
+    return str(path)
+
+
+def test_unchanged_refresh_keeps_cache_file(tmp_path):
+    source = write_csv(tmp_path / 'ledger.csv', 2000)
+    cache = str(tmp_path / 'ledger.parquet')
+    ledger = IncrementalLedger(source, cache_path=cache)
+    ledger.refresh()
+    written = os.stat(cache).st_mtime_ns
+
+    ledger.refresh()
+    assert ledger.changed_rows == 0
+    assert os.stat(cache).st_mtime_ns == written
+
+    # Холодный старт из кэша: первая сверка с тем же источником файл тоже не трогает
+    restarted = IncrementalLedger(source, cache_path=cache)
+    assert restarted.load_cache()
+    restarted.refresh()
+    assert os.stat(cache).st_mtime_ns == written
+    pd.testing.assert_frame_equal(restarted.df, ledger.df)
+
+
+def test_damaged_cache_is_ignored(tmp_path):
+    source = write_csv(tmp_path / 'ledger.csv', 500)
+    cache = tmp_path / 'ledger.parquet'
+    IncrementalLedger(source, cache_path=str(cache)).refresh()
+    data = cache.read_bytes()
+    cache.write_bytes(data[:len(data) // 2] + b'\0' * (len(data) - len(data) // 2))
+
+    ledger = IncrementalLedger(source, cache_path=str(cache))
+    assert not ledger.load_cache()
+    assert ledger.refresh() is not None
+
+
+def chunked(chunksize):
+    return lambda url: read_chunks(url, chunksize=chunksize)
+
+
+def test_chunks_match_single_read(tmp_path):
+    source = write_csv(tmp_path / 'ledger.csv', 10_000)
+    whole = IncrementalLedger(source, fetch=chunked(10_000))
+    whole.refresh()
+    parts = IncrementalLedger(source, fetch=chunked(1_500))
+    parts.refresh()
+
+    # Категории частей объединяются в порядке появления, сравниваются значения
+    pd.testing.assert_frame_equal(parts.df, whole.df, check_categorical=False)
+    assert parts.rejected == whole.rejected
+
+
+def test_patched_refresh_matches_rebuild(tmp_path):
+    path = tmp_path / 'ledger.csv'
+    raw = generate_ledger(5_000)
+    raw.to_csv(path, index=False)
+    ledger = IncrementalLedger(str(path), fetch=chunked(1_000))
+    ledger.refresh()
+
+    # Правки на месте, битое значение и дописанные строки
+    raw.loc[10, 'Брутто'] = '99,5'
+    raw.loc[2_500, 'Дата отгрузки авто'] = 'мусор'
+    raw = pd.concat([raw, generate_ledger(700, part=1)], ignore_index=True)
+    raw.to_csv(path, index=False)
+    ledger.refresh()
+    assert ledger.changed_rows == 702
+
+    fresh = IncrementalLedger(str(path), fetch=chunked(1_000))
+    fresh.refresh()
+    pd.testing.assert_frame_equal(ledger.df.astype(fresh.df.dtypes.to_dict()), fresh.df)
+    assert ledger.rejected == fresh.rejected
+
+
+def test_inserted_and_deleted_rows_are_not_recleaned(tmp_path):
+    path = tmp_path / 'ledger.csv'
+    raw = generate_ledger(5_000)
+    raw.to_csv(path, index=False)
+    ledger = IncrementalLedger(str(path), fetch=chunked(1_000))
+    ledger.refresh()
+
+    # Строка в начале, две в середине, удалённый блок и перестановка двух строк
+    extra = generate_ledger(3, part=1)
+    raw = pd.concat([extra.iloc[:1], raw.iloc[:1_200], extra.iloc[1:], raw.iloc[1_250:3_000],
+                     raw.iloc[[3_001, 3_000]], raw.iloc[3_002:]], ignore_index=True)
+    raw.to_csv(path, index=False)
+    ledger.refresh()
+    assert ledger.changed_rows == 3
+
+    fresh = IncrementalLedger(str(path), fetch=chunked(1_000))
+    fresh.refresh()
+    pd.testing.assert_frame_equal(ledger.df.astype(fresh.df.dtypes.to_dict()), fresh.df)
+    assert ledger.rejected == fresh.rejected
+    assert ledger.pier.total() == pytest.approx(fresh.pier.total())
+
+
+# Пик выделенной памяти при полной загрузке, по tracemalloc (numpy и pandas в нём видны)
+def traced_peak(path, chunksize):
+    tracemalloc.start()
+    try:
+        ledger = IncrementalLedger(path, fetch=chunked(chunksize))
+        ledger.refresh()
+        return tracemalloc.get_traced_memory()[1], ledger.memory_after
+    finally:
+        tracemalloc.stop()
+
+
+# Пик — около двух компактных журналов плюс одна сырая часть: от размера
+# части зависит только последнее слагаемое, чтение целиком заметно дороже
+def test_chunked_load_peak_memory(tmp_path):
+    source = write_csv(tmp_path / 'ledger.csv', 50_000)
+    streamed, ledger = traced_peak(source, 5_000)
+    whole, _ = traced_peak(source, 50_000)
+    assert streamed < 2 * ledger
+    assert whole > streamed * 1.3
+
+
+def peak_growth(path, chunksize):
+    output = subprocess.run([sys.executable, '-c', PEAK_SCRIPT, path, str(chunksize)], cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+# То же по RSS отдельного процесса на большой выгрузке
+@pytest.mark.skipif(not LARGE_ROWS, reason='большая выгрузка: задайте YAKHROMA_TEST_LARGE_ROWS')
+def test_large_sheet_peak_memory():
+    path = ensure_ledger(os.path.join(BENCH_DIR, 'data'), LARGE_ROWS)
+    streamed = peak_growth(path, 50_000)
+    assert streamed['rows'] == LARGE_ROWS
+    assert streamed['growth'] < 2 * streamed['ledger'] + 64 * 2**20
+
+    whole = peak_growth(path, LARGE_ROWS)
+    assert whole['growth'] > streamed['growth'] * 1.3
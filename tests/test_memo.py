@@ -0,0 +1,108 @@
+"""Общий кэш производных значений по снимкам журнала."""
+import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from memo import FINGERPRINT_ATTR, SnapshotMemo, SnapshotStore, fingerprint
+
+
+def test_concurrent_callers_compute_once():
+    memo = SnapshotMemo()
+    calls = []
+    started = threading.Barrier(50)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    def request():
+        started.wait()
+        return memo.get_or_compute('snapshot', 'aggregates', compute)
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        values = list(pool.map(lambda _: request(), range(50)))
+
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+    assert memo.misses == 1
+    assert memo.hits + memo.waits == 49
+
+
+def test_failed_compute_is_not_cached():
+    memo = SnapshotMemo()
+
+    def fail():
+        raise ValueError('нет данных')
+
+    with pytest.raises(ValueError):
+        memo.get_or_compute('snapshot', 'aggregates', fail)
+    assert memo.get_or_compute('snapshot', 'aggregates', lambda: 42) == 42
+    assert len(memo) == 1
+
+
+def frame(value):
+    df = pd.DataFrame({'брутто': [value]})
+    df.attrs[FINGERPRINT_ATTR] = f'snapshot-{value}'
+    return df
+
+
+class Loader:
+    """Загрузчик с одним текущим снимком, который тест подменяет."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def frames(self):
+        return [self.df]
+
+
+def fill(memo, df):
+    memo.get_or_compute(fingerprint(df), 'aggregates', lambda: df['брутто'].sum())
+
+
+def test_leased_snapshot_survives_swap_until_released():
+    memo = SnapshotMemo()
+    old = frame(1)
+    loader = Loader(old)
+    store = SnapshotStore(memo, loader.frames)
+
+    lease = store.lease(old)
+    fill(memo, old)
+    loader.df = frame(2)
+    fill(memo, loader.df)
+    assert store.sweep() == set()
+    assert memo.snapshots() == {'snapshot-1', 'snapshot-2'}
+
+    lease.release()
+    assert memo.snapshots() == {'snapshot-2'}
+    assert (store.leases, store.released) == (0, 1)
+
+    # Повторный release ничего не меняет, текущий снимок без аренд не удаляется
+    lease.release()
+    assert store.leases == 0
+    assert memo.snapshots() == {'snapshot-2'}
+
+
+def test_dropped_session_releases_through_finalizer():
+    memo = SnapshotMemo()
+    old = frame(1)
+    loader = Loader(old)
+    store = SnapshotStore(memo, loader.frames)
+
+    # Сессия прервалась до release: аренда лежит только в её состоянии
+    session = {'snapshot_lease': store.lease(old)}
+    fill(memo, old)
+    loader.df = frame(2)
+    store.sweep()
+    assert 'snapshot-1' in memo.snapshots() and store.leases == 1
+
+    del session
+    gc.collect()
+    assert store.leases == 0
+    assert memo.snapshots() == set()
+    assert store.released == 1
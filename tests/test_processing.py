@@ -0,0 +1,144 @@
+"""Векторная очистка выгрузки даёт тот же журнал, что и прежние построчные функции."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_ledger
+from loader import read_chunks
+from aggregates import compute_aggregates
+from processing import (CATEGORY_COLUMNS, clean_data, compact_ledger, map_columns, memory_usage,
+                        normalize_column_names, raw_duplicate_columns)
+
+
+# Прежний load_and_process_data после чтения CSV: построчные apply без изменений
+def reference_process(df):
+    df.columns = df.columns.str.lower().str.replace('ё', 'е').str.replace('c', 'с', regex=False)
+    df.columns = df.columns.str.strip()
+
+    required_columns = ['судно', 'дата принятия на пирс', 'дата отгрузки авто',
+                        'перевозчик', 'номер авто', 'тн', 'клиент', '№ сертиф.', 'брутто']
+    column_mapping = {}
+    for req_col in required_columns:
+        matched = False
+        for avail_col in df.columns:
+            if req_col == avail_col or req_col in avail_col:
+                column_mapping[req_col] = avail_col
+                matched = True
+                break
+        if not matched:
+            column_mapping[req_col] = req_col
+
+    for standard_name, actual_name in column_mapping.items():
+        if actual_name in df.columns:
+            df[standard_name] = df[actual_name]
+        else:
+            df[standard_name] = np.nan
+
+    def parse_date(date_str):
+        if pd.isna(date_str) or date_str == '' or str(date_str).strip() == 'nan':
+            return pd.NaT
+        try:
+            return datetime.strptime(str(date_str).strip(), '%d.%m.%Y')
+        except:
+            try:
+                return pd.to_datetime(date_str)
+            except:
+                return pd.NaT
+
+    df['дата_принятия_на_пирс'] = df['дата принятия на пирс'].apply(parse_date)
+    df['дата_отгрузки_авто'] = df['дата отгрузки авто'].apply(parse_date)
+
+    def safe_convert_to_float(x):
+        if pd.isna(x) or x == '' or str(x).strip() == 'nan':
+            return np.nan
+        try:
+            x_str = str(x).replace(',', '.').strip()
+            return float(x_str)
+        except:
+            return np.nan
+
+    df['брутто'] = df['брутто'].apply(safe_convert_to_float)
+
+    def safe_str_convert(x):
+        if pd.isna(x) or x == '' or str(x).strip() == 'nan':
+            return ''
+        return str(x).strip()
+
+    text_columns = ['судно', 'перевозчик', 'номер авто', 'тн', 'клиент', '№ сертиф.']
+    for col in text_columns:
+        if col in df.columns:
+            df[col] = df[col].apply(safe_str_convert)
+
+    return df
+
+
+def process(path):
+    raw = normalize_column_names(pd.concat(read_chunks(path), ignore_index=True))
+    return clean_data(map_columns(raw))
+
+
+@pytest.fixture(scope='module')
+def ledger_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp('ledger') / 'ledger.csv'
+    generate_ledger(100_000, seed=1).to_csv(path, index=False)
+    return str(path)
+
+
+def test_matches_apply_parsers(ledger_csv):
+    expected = reference_process(pd.read_csv(ledger_csv))
+    # Бесконечный вес теперь отклоняется схемой, а не попадает в итоги
+    expected['брутто'] = expected['брутто'].where(np.isfinite(expected['брутто']))
+
+    result = process(ledger_csv)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_mixed_formats_fall_back_per_value():
+    raw = pd.DataFrame({
+        'судно': ['Нева (2)', ' Ладога ', None],
+        'дата принятия на пирс': ['01.02.2024', '2024-02-03', 'мусор'],
+        'дата отгрузки авто': [' 5.2.2024 ', '', 'nan'],
+        'клиент': ['ООО Ромашка', 'nan', ''],
+        'брутто': ['12,5', '1_000', 'inf'],
+    })
+    result = clean_data(map_columns(raw.copy()))
+
+    assert result['дата_принятия_на_пирс'].tolist()[:2] == [pd.Timestamp('2024-02-01'), pd.Timestamp('2024-02-03')]
+    assert pd.isna(result['дата_принятия_на_пирс'].iloc[2])
+    assert result['дата_отгрузки_авто'].iloc[0] == pd.Timestamp('2024-02-05')
+    assert result['дата_отгрузки_авто'].iloc[1:].isna().all()
+    assert result['брутто'].iloc[:2].tolist() == [12.5, 1000.0]
+    assert np.isnan(result['брутто'].iloc[2])
+    assert result['судно'].tolist() == ['Нева (2)', 'Ладога', '']
+    assert result['клиент'].tolist() == ['ООО Ромашка', '', '']
+    # Необязательной колонки нет в выгрузке: она пустая, как и раньше
+    assert result['перевозчик'].tolist() == ['', '', '']
+
+
+def test_compact_ledger_drops_duplicates_and_keeps_aggregates():
+    raw = normalize_column_names(generate_ledger(5_000, seed=2).rename(
+        columns={'Брутто': 'Брутто, т', 'Клиент': 'Клиент (получатель)'}).assign(Примечание=''))
+    columns = list(raw.columns)
+    cleaned = clean_data(map_columns(raw))
+    compact = compact_ledger(cleaned.copy(), columns)
+
+    # Сырые дубли (переименованные заголовки и даты текстом) удалены, посторонняя колонка осталась
+    assert raw_duplicate_columns(columns) == ['клиент (получатель)', 'брутто, т',
+                                              'дата принятия на пирс', 'дата отгрузки авто']
+    assert not set(raw_duplicate_columns(columns)) & set(compact.columns)
+    assert 'примечание' in compact.columns
+
+    for col in CATEGORY_COLUMNS:
+        assert isinstance(compact[col].dtype, pd.CategoricalDtype)
+        assert compact[col].astype(object).tolist() == cleaned[col].tolist()
+    assert compact['брутто'].dtype == np.float32
+    assert memory_usage(compact) < memory_usage(cleaned) / 2
+
+    expected, actual = compute_aggregates(cleaned), compute_aggregates(compact)
+    assert actual['status_totals'] == pytest.approx(expected['status_totals'], rel=1e-5)
+    pd.testing.assert_frame_equal(actual['client_status'].astype({'клиент': object}).reset_index(drop=True),
+                                  expected['client_status'].reset_index(drop=True), rtol=1e-5)
+    pd.testing.assert_frame_equal(actual['vessel_stats'], expected['vessel_stats'], rtol=1e-5)
@@ -0,0 +1,100 @@
+"""Фоновое обновление против локального HTTP-сервера: ошибки, таймауты, повторы."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.synthetic import generate_ledger
+from loader import IncrementalLedger, read_chunks
+from refresher import BackgroundRefresher
+
+
+class StandIn:
+    """Выгрузка по HTTP; replies — очередь ответов: 'error' (500), 'slow' или 'ok'."""
+
+    def __init__(self, csv):
+        self.csv = csv
+        self.replies = []
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests.append(time.monotonic())
+                reply = stand_in.replies.pop(0) if stand_in.replies else 'ok'
+                if reply == 'error':
+                    self.send_error(500)
+                    return
+                if reply == 'slow':
+                    time.sleep(1)
+                body = stand_in.csv.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/export?format=csv'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def stand_in():
+    stand_in = StandIn(generate_ledger(300).to_csv(index=False))
+    yield stand_in
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+
+def make_refresher(stand_in, retries=3, backoff=0.05, interval=60):
+    ledger = IncrementalLedger(stand_in.url, fetch=lambda url: read_chunks(url, timeout=0.3))
+    return BackgroundRefresher(ledger, interval=interval, retries=retries, backoff=backoff)
+
+
+def test_retries_error_and_timeout_with_backoff(stand_in):
+    stand_in.replies = ['error', 'slow', 'ok']
+    refresher = make_refresher(stand_in)
+
+    assert refresher.refresh_once()
+    assert len(stand_in.requests) == 3
+    gaps = [later - earlier for earlier, later in zip(stand_in.requests, stand_in.requests[1:])]
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.3 + 0.1
+    assert len(refresher.ledger.df) == 300
+    assert refresher.last_error is None and refresher.last_success is not None
+
+
+def test_failed_refresh_keeps_last_snapshot(stand_in):
+    refresher = make_refresher(stand_in, retries=2)
+    assert refresher.refresh_once()
+    snapshot = refresher.ledger.df
+    succeeded_at = refresher.last_success
+
+    stand_in.replies = ['error', 'slow']
+    assert not refresher.refresh_once()
+    assert len(stand_in.requests) == 3
+    assert refresher.ledger.df is snapshot
+    assert refresher.last_error is not None
+    assert refresher.loaded_at() == succeeded_at
+
+
+def test_refresh_now_waits_for_a_new_refresh(stand_in):
+    refresher = make_refresher(stand_in).start()
+    try:
+        assert refresher.wait_for_snapshot(timeout=5) is not None
+        assert len(refresher.ledger.df) == 300
+
+        stand_in.csv = generate_ledger(400).to_csv(index=False)
+        assert refresher.refresh_now(timeout=5)
+        assert len(refresher.ledger.df) == 400
+
+        stand_in.replies = ['error'] * 3
+        assert not refresher.refresh_now(timeout=5)
+        assert len(refresher.ledger.df) == 400
+    finally:
+        refresher.stop()
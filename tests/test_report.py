@@ -0,0 +1,24 @@
+"""Отчёт без Streamlit: таблицы дашборда в файлах."""
+import pandas as pd
+
+import report
+from benchmarks.synthetic import generate_ledger
+
+
+def test_report_files(tmp_path):
+    source = tmp_path / 'ledger.csv'
+    generate_ledger(5_000, seed=4).to_csv(source, index=False)
+    output = tmp_path / 'reports'
+
+    # 2024-01-03 — среда: первая неделя обрезана началом диапазона
+    assert report.main([str(source), '-o', str(output), '--period', 'W',
+                        '--start', '2024-01-03', '--end', '2024-01-31']) == 0
+
+    weeks = pd.read_csv(output / 'monthly_stats.csv')
+    assert weeks['неделя'].tolist()[:2] == ['2024-01-03', '2024-01-08']
+
+    # Тоннаж без шума float32
+    for name in report.TABLES:
+        table = pd.read_csv(output / f'{name}.csv')
+        for column in table.select_dtypes('float').columns:
+            pd.testing.assert_series_equal(table[column], table[column].round(report.TONNAGE_DECIMALS))
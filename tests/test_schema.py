@@ -0,0 +1,60 @@
+"""Сопоставление заголовков выгрузки со схемой и отметки отклонённых значений."""
+import numpy as np
+import pytest
+
+from schema import LEDGER_SCHEMA, Schema, SchemaError
+
+REQUIRED = ['судно', 'дата принятия на пирс', 'дата отгрузки авто', 'клиент', 'брутто']
+
+
+def test_exact_names_win_over_words():
+    resolution = LEDGER_SCHEMA.resolve(REQUIRED[:-1] + ['брутто, т', 'масса брутто'])
+    assert resolution.mapping['брутто'] == 'масса брутто'
+    assert resolution.unused == ['брутто, т']
+
+
+def test_required_column_takes_contested_header():
+    resolution = LEDGER_SCHEMA.resolve(REQUIRED[:-1] + ['брутто, тн'])
+    assert resolution.mapping['брутто'] == 'брутто, тн'
+    assert 'тн' in resolution.missing
+    assert resolution.ok
+
+    # Своя колонка ТН по-прежнему находится точным названием
+    resolution = LEDGER_SCHEMA.resolve(REQUIRED[:-1] + ['брутто, тн', 'тн'])
+    assert resolution.mapping['брутто'] == 'брутто, тн'
+    assert resolution.mapping['тн'] == 'тн'
+
+
+def test_required_columns_competing_for_header_fail():
+    with pytest.raises(SchemaError) as error:
+        LEDGER_SCHEMA.resolve(['клиент судно', 'дата принятия на пирс', 'дата отгрузки авто', 'брутто'])
+    assert error.value.resolution.conflicts == {'клиент судно': ['судно', 'клиент']}
+    assert 'колонки «судно», «клиент» претендуют на один заголовок «клиент судно»' in str(error.value)
+
+
+def test_several_headers_for_required_column_fail():
+    with pytest.raises(SchemaError) as error:
+        LEDGER_SCHEMA.resolve(REQUIRED[:-1] + ['брутто, т', 'брутто (кг)'])
+    assert 'колонке «брутто» подходят несколько заголовков: «брутто, т», «брутто (кг)»' in str(error.value)
+
+
+def test_missing_required_column_fails():
+    with pytest.raises(SchemaError, match='нет колонок: клиент'):
+        LEDGER_SCHEMA.resolve([name for name in REQUIRED if name != 'клиент'])
+
+
+def test_repeated_header_is_cached():
+    schema = Schema(LEDGER_SCHEMA.columns)
+    first = schema.resolve(REQUIRED)
+    assert schema.resolve(list(REQUIRED)) is first
+    assert (schema.hits, schema.misses) == (1, 1)
+
+
+def test_rejected_flags_round_trip():
+    rng = np.random.default_rng(0)
+    rejected = {name: rng.random(100) < 0.2 for name in LEDGER_SCHEMA.validated}
+    flags = LEDGER_SCHEMA.pack_rejected(rejected, 100)
+    assert flags.dtype == np.uint8
+    assert LEDGER_SCHEMA.rejected_counts(flags) == {name: int(mask.sum()) for name, mask in rejected.items()}
+    assert LEDGER_SCHEMA.rejected_counts(LEDGER_SCHEMA.pack_rejected({}, 5)) == dict.fromkeys(
+        LEDGER_SCHEMA.validated, 0)
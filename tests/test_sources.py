@@ -0,0 +1,83 @@
+"""Несколько источников в одном журнале."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_ledger
+from loader import IncrementalLedger
+from memo import FINGERPRINT_ATTR
+from refresher import BackgroundRefresher
+from sources import SOURCE_COLUMN, MultiSourceLedger, SourceError
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = {}
+    for part, name in enumerate(['Яхрома', 'Дмитров']):
+        path = tmp_path / f'{part}.csv'
+        generate_ledger(1_000 + 500 * part, seed=5, part=part).to_csv(path, index=False)
+        paths[name] = str(path)
+    return paths
+
+
+def test_merged_ledger(sources):
+    ledger = MultiSourceLedger(sources)
+    df = ledger.refresh()
+
+    assert len(df) == 2_500
+    assert df[SOURCE_COLUMN].value_counts().to_dict() == {'Яхрома': 1_000, 'Дмитров': 1_500}
+    assert ledger.pier.total()[1] == sum(ledger.pier_snapshot(ledger.frame(name), name).total()[1]
+                                         for name in ledger.names)
+
+
+def test_partial_refresh_is_a_success(sources, tmp_path):
+    sources['Дмитров'] = str(tmp_path / 'missing.csv')
+    ledger = MultiSourceLedger(sources)
+    refresher = BackgroundRefresher(ledger, retries=1)
+
+    assert refresher.refresh_once()
+    assert list(ledger.errors) == ['Дмитров']
+    assert len(ledger.df) == 1_000 and ledger.frame('Дмитров') is None
+    assert ledger.validated
+    assert refresher.last_error is None and refresher.loaded_at() is not None
+
+
+def test_all_sources_failing_raises(tmp_path):
+    ledger = MultiSourceLedger({'A': str(tmp_path / 'a.csv'), 'B': str(tmp_path / 'b.csv')})
+    with pytest.raises(SourceError):
+        ledger.refresh()
+    refresher = BackgroundRefresher(ledger, retries=1)
+    assert not refresher.refresh_once()
+    assert refresher.loaded_at() is None
+
+
+def test_source_stages_are_not_counted_twice(sources):
+    ledger = MultiSourceLedger(sources)
+    ledger.refresh()
+    log = ledger.stages
+
+    assert set(log.stages) == {'sources', 'merge'}
+    assert set(log.children) == set(sources)
+    assert log.total() == pytest.approx(log.stages['sources']['seconds'] + log.stages['merge']['seconds'])
+    assert log.to_dict()['children']['Яхрома']['stages']
+
+
+def test_source_frames_are_slices_of_merged(sources):
+    ledger = MultiSourceLedger(sources)
+    df = ledger.refresh()
+
+    for name in ledger.names:
+        frame = ledger.frame(name)
+        assert SOURCE_COLUMN not in frame.columns
+        assert list(frame.index) == list(range(len(frame)))
+        assert np.shares_memory(frame['брутто'].to_numpy(), df['брутто'].to_numpy())
+        assert frame.attrs[FINGERPRINT_ATTR] != df.attrs[FINGERPRINT_ATTR]
+
+    # Дописанные строки накладываются на срез так же, как на собственный снимок
+    generate_ledger(200, seed=5, part=7).to_csv(sources['Яхрома'], mode='a', header=False, index=False)
+    ledger.refresh()
+    fresh = IncrementalLedger(sources['Яхрома'])
+    fresh.refresh()
+    pd.testing.assert_frame_equal(ledger.frame('Яхрома'), fresh.df, check_categorical=False)
+    assert ledger.frame('Яхрома').attrs == fresh.df.attrs
+    assert len(ledger.df) == 2_700
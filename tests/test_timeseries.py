@@ -0,0 +1,98 @@
+"""Дневные свёртки и динамика по периодам против группировки журнала через pd.Grouper."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_ledger
+from processing import clean_data, map_columns, normalize_column_names
+from timeseries import PERIOD_LABELS, DateIndex
+
+# Недели начинаются с понедельника и подписываются им, месяцы — первым числом
+GROUPERS = {'D': 'D', 'W': 'W-MON', 'M': 'MS'}
+COLUMNS = ['принято_тонн', 'принято_мест', 'отгружено_тонн', 'уникальных_клиентов']
+
+
+@pytest.fixture(scope='module')
+def df():
+    return clean_data(map_columns(normalize_column_names(generate_ledger(20_000, seed=6))))
+
+
+@pytest.fixture(scope='module')
+def index(df):
+    return DateIndex(df)
+
+
+def grouped(df, date, freq, start, end):
+    rows = df[df[date].notna()]
+    if start is not None:
+        rows = rows[rows[date] >= pd.Timestamp(start)]
+    if end is not None:
+        rows = rows[rows[date] < pd.Timestamp(end) + pd.Timedelta(days=1)]
+    groups = rows.groupby(pd.Grouper(key=date, freq=GROUPERS[freq], closed='left', label='left'))
+    return groups.agg(тонн=('брутто', 'sum'), мест=('брутто', 'size'), клиентов=('клиент', 'nunique'))
+
+
+def reference_stats(df, freq, start=None, end=None):
+    arrivals = grouped(df, 'дата_принятия_на_пирс', freq, start, end)
+    shipments = grouped(df, 'дата_отгрузки_авто', freq, start, end)
+    stats = pd.DataFrame({
+        'принято_тонн': arrivals['тонн'][arrivals['мест'] > 0],
+        'принято_мест': arrivals['мест'][arrivals['мест'] > 0],
+    }).join(pd.DataFrame({
+        'отгружено_тонн': shipments['тонн'][shipments['мест'] > 0],
+        'уникальных_клиентов': shipments['клиентов'][shipments['мест'] > 0],
+    }), how='outer').fillna(0).sort_index()
+
+    labels = [label.strftime('%Y-%m' if freq == 'M' else '%Y-%m-%d') for label in stats.index]
+    if start is not None and len(labels) and stats.index[0] < pd.Timestamp(start):
+        labels[0] = pd.Timestamp(start).strftime('%Y-%m-%d')
+    stats.insert(0, PERIOD_LABELS[freq], labels)
+    return stats.reset_index(drop=True)
+
+
+def assert_same(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    assert actual.iloc[:, 0].tolist() == expected.iloc[:, 0].tolist()
+    for column in COLUMNS:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=np.float64),
+                                   expected[column].to_numpy(dtype=np.float64), rtol=1e-9)
+
+
+@pytest.mark.parametrize('freq', ['D', 'W', 'M'])
+def test_period_stats_match_grouper(df, index, freq):
+    assert_same(index.period_stats(freq), reference_stats(df, freq))
+    # 2022-03-01 — вторник и первое число месяца
+    assert_same(index.period_stats(freq, '2022-03-01', '2022-06-30'),
+                reference_stats(df, freq, '2022-03-01', '2022-06-30'))
+
+
+@pytest.mark.parametrize('freq', ['D', 'W', 'M'])
+def test_start_inside_period(df, index, freq):
+    stats = index.period_stats(freq, '2022-03-03', '2022-04-10')
+    assert_same(stats, reference_stats(df, freq, '2022-03-03', '2022-04-10'))
+    assert stats.iloc[0, 0] == '2022-03-03'
+    if freq == 'M':
+        assert stats.iloc[1, 0] == '2022-04'
+
+
+@pytest.mark.parametrize('start, end', [('2030-01-01', '2030-12-31'), ('2022-06-30', '2022-03-01')])
+def test_empty_and_inverted_ranges(index, start, end):
+    for freq in PERIOD_LABELS:
+        stats = index.period_stats(freq, start, end)
+        assert stats.empty
+        assert list(stats.columns) == [PERIOD_LABELS[freq]] + COLUMNS
+    assert index.shipments.total(start, end) == (0.0, 0)
+    assert index.shipped_by_client(start, end).empty
+
+
+def test_totals_and_clients_match_masks(df, index):
+    shipped = df[(df['дата_отгрузки_авто'] >= '2022-03-01') & (df['дата_отгрузки_авто'] < '2022-04-01')]
+    tonnage, count = index.shipments.total('2022-03-01', '2022-03-31')
+    assert count == len(shipped)
+    assert tonnage == pytest.approx(shipped['брутто'].sum())
+
+    by_client = index.shipped_by_client('2022-03-01', '2022-03-31').set_index('клиент')['брутто']
+    expected = shipped.groupby('клиент')['брутто'].sum()
+    pd.testing.assert_series_equal(by_client.sort_index(), expected.sort_index(), check_names=False)
+    assert index.date_range() == (df['дата_принятия_на_пирс'].min().date(),
+                                  max(df['дата_принятия_на_пирс'].max(), df['дата_отгрузки_авто'].max()).date())
@@ -0,0 +1,47 @@
+"""Индекс судов: разбор кругорейсов, итоги по судам и история кругорейсов."""
+import numpy as np
+import pandas as pd
+
+from vessels import VesselIndex, split_voyages
+
+
+def test_split_voyages():
+    names = np.array(['Волгонефть (3)', ' Волгонефть(12) ', 'Дон', 'Сормовский (1) груз', '', None, 'Омский (x)'],
+                     dtype=object)
+    base_names, voyages = split_voyages(names)
+    assert base_names.tolist() == ['Волгонефть', 'Волгонефть', 'Дон', 'Сормовский (1) груз', '', '', 'Омский (x)']
+    assert voyages.tolist() == [3, 12, 0, 0, 0, 0, 0]
+
+
+def ledger():
+    return pd.DataFrame({
+        'судно': pd.Categorical(['Волгонефть (1)', 'Волгонефть (1)', 'Волгонефть (2)', 'Дон', 'Дон',
+                                 'Волгонефть (2)', 'Ока (4)']),
+        'дата_принятия_на_пирс': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-02-05', '2024-01-10',
+                                                 '2024-01-11', None, '2024-03-01']),
+        'брутто': np.array([10, 5, 7, 3, np.nan, 100, 0], dtype=np.float32),
+    })
+
+
+def test_totals_by_base_name():
+    index = VesselIndex(ledger())
+    totals = index.totals
+    assert totals.loc['Волгонефть'].tolist() == [2, 2, 22.0]
+    assert totals.loc['Дон'].tolist() == [2, 0, 3.0]
+
+    # Суда без тоннажа в статистику не попадают; не принятые на пирс строки не считаются
+    stats = index.stats()
+    assert stats['судно'].tolist() == ['Волгонефть', 'Дон']
+
+
+def test_voyage_history():
+    index = VesselIndex(ledger())
+    history = index.voyage_history('Волгонефть')
+    assert history.index.tolist() == [1, 2]
+    assert history['мест'].tolist() == [2, 1]
+    assert history['тоннаж'].tolist() == [15.0, 7.0]
+    assert history['первое_принятие'].tolist() == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-05')]
+
+    assert index.voyage_history('Дон').index.tolist() == [0]
+    missing = index.voyage_history('Нет такого')
+    assert missing.empty and list(missing.columns) == list(history.columns)
@@ -0,0 +1,150 @@
+"""Индекс журнала по датам принятия и отгрузки с дневными свёртками."""
+import numpy as np
+import pandas as pd
+
+PERIOD_LABELS = {'D': 'день', 'W': 'неделя', 'M': 'месяц'}
+
+
+def to_day(value):
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+# Начало периода (день, неделя с понедельника, месяц) для массива дней
+def period_start(days, freq):
+    if freq == 'D':
+        return days
+    if freq == 'W':
+        # 1970-01-01 — четверг
+        weekday = (days.astype(np.int64) + 3) % 7
+        return days - weekday.astype('timedelta64[D]')
+    if freq == 'M':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Неизвестный период: {freq}")
+
+
+def format_period(starts, freq):
+    if freq == 'M':
+        return np.datetime_as_string(starts.astype('datetime64[M]')).astype(object)
+    return np.datetime_as_string(starts).astype(object)
+
+
+# Границы групп в отсортированном массиве
+def _segments(sorted_values):
+    if len(sorted_values) == 0:
+        return sorted_values, np.zeros(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.flatnonzero(sorted_values[1:] != sorted_values[:-1]) + 1])
+    return sorted_values[starts], starts
+
+
+class DailyRollup:
+    """Итоги журнала по дням одной даты: всего и по клиентам.
+
+    Диапазон дат находится бинарным поиском, а суммы за диапазон
+    складываются из дневных итогов, поэтому запросы не сканируют журнал.
+    """
+
+    def __init__(self, dates, weights, client_codes):
+        days = dates.astype('datetime64[D]')
+        present = ~np.isnat(days)
+        order = np.argsort(days[present], kind='stable')
+
+        positions = np.flatnonzero(present)[order]
+        row_days = days[present][order]
+        weights = np.where(np.isnan(weights), 0.0, weights)[positions]
+
+        self.days, starts, self.counts = np.unique(row_days, return_index=True, return_counts=True)
+        self.tonnage = np.add.reduceat(weights, starts) if len(weights) else np.zeros(0)
+
+        # Свёртка (день, клиент) для разбивки по клиентам и подсчёта уникальных клиентов
+        by_client = pd.DataFrame({
+            'день': row_days,
+            'клиент': client_codes[positions],
+            'брутто': weights,
+        }).groupby(['день', 'клиент'], sort=True)['брутто'].sum().reset_index()
+        self.client_days = by_client['день'].to_numpy().astype('datetime64[D]')
+        self.client_codes = by_client['клиент'].to_numpy()
+        self.client_tonnage = by_client['брутто'].to_numpy()
+
+    def _bounds(self, days, start, end):
+        lo = 0 if start is None else np.searchsorted(days, to_day(start), side='left')
+        hi = len(days) if end is None else np.searchsorted(days, to_day(end), side='right')
+        return lo, hi
+
+    def total(self, start=None, end=None):
+        lo, hi = self._bounds(self.days, start, end)
+        return float(self.tonnage[lo:hi].sum()), int(self.counts[lo:hi].sum())
+
+    def by_client(self, start=None, end=None):
+        lo, hi = self._bounds(self.client_days, start, end)
+        return pd.Series(self.client_tonnage[lo:hi]).groupby(self.client_codes[lo:hi]).sum()
+
+    # Дни отсортированы, поэтому начала периодов идут подряд и сворачиваются reduceat
+    def by_period(self, freq, start=None, end=None):
+        lo, hi = self._bounds(self.days, start, end)
+        periods, starts = _segments(period_start(self.days[lo:hi], freq))
+        if len(periods) == 0:
+            return periods, np.zeros(0), np.zeros(0, dtype=np.int64)
+        return periods, np.add.reduceat(self.tonnage[lo:hi], starts), np.add.reduceat(self.counts[lo:hi], starts)
+
+    def unique_clients_by_period(self, freq, start=None, end=None):
+        lo, hi = self._bounds(self.client_days, start, end)
+        periods, starts = _segments(period_start(self.client_days[lo:hi], freq))
+        codes = self.client_codes[lo:hi].astype(np.int64)
+        if len(codes) == 0:
+            return periods, np.zeros(0, dtype=np.int64)
+
+        # Уникальные пары (период, клиент) через составной целочисленный ключ
+        segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(codes))))
+        width = codes.max() + 1
+        pairs = np.unique(segment * width + codes)
+        return periods, np.bincount(pairs // width, minlength=len(periods))
+
+
+class DateIndex:
+    """Дневные свёртки по дате принятия на пирс и по дате отгрузки авто."""
+
+    def __init__(self, df):
+        client_codes, clients = pd.factorize(df['клиент'], use_na_sentinel=False)
+        self.clients = np.asarray(clients, dtype=object)
+        weights = df['брутто'].to_numpy(dtype=np.float64)
+
+        self.arrivals = DailyRollup(df['дата_принятия_на_пирс'].to_numpy(), weights, client_codes)
+        self.shipments = DailyRollup(df['дата_отгрузки_авто'].to_numpy(), weights, client_codes)
+
+    def date_range(self):
+        days = np.concatenate([self.arrivals.days, self.shipments.days])
+        if len(days) == 0:
+            return None, None
+        return pd.Timestamp(days.min()).date(), pd.Timestamp(days.max()).date()
+
+    # Отгрузки по клиентам за диапазон дат, по убыванию тоннажа
+    def shipped_by_client(self, start=None, end=None):
+        totals = self.shipments.by_client(start, end)
+        shipped = pd.DataFrame({'клиент': self.clients[totals.index.to_numpy()], 'брутто': totals.to_numpy()})
+        return shipped.sort_values('брутто', ascending=False)
+
+    # Принято и отгружено по периодам (день, неделя, месяц)
+    def period_stats(self, freq='M', start=None, end=None):
+        arrival_periods, arrival_tonnage, arrival_counts = self.arrivals.by_period(freq, start, end)
+        shipment_periods, shipment_tonnage, _ = self.shipments.by_period(freq, start, end)
+        client_periods, client_counts = self.shipments.unique_clients_by_period(freq, start, end)
+
+        periods = np.union1d(arrival_periods, shipment_periods)
+
+        def spread(keys, values, dtype):
+            column = np.zeros(len(periods), dtype=dtype)
+            column[np.searchsorted(periods, keys)] = values
+            return column
+
+        # Первый период, обрезанный началом диапазона, подписан этим днём, а не
+        # началом недели или месяца (и для месяцев — полной датой)
+        labels = format_period(periods, freq)
+        if start is not None and len(periods) and periods[0] < to_day(start):
+            labels[0] = np.datetime_as_string(to_day(start))
+        return pd.DataFrame({
+            PERIOD_LABELS[freq]: labels,
+            'принято_тонн': spread(arrival_periods, arrival_tonnage, np.float64),
+            'принято_мест': spread(arrival_periods, arrival_counts, np.int64),
+            'отгружено_тонн': spread(shipment_periods, shipment_tonnage, np.float64),
+            'уникальных_клиентов': spread(client_periods, client_counts, np.int64),
+        })
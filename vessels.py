@@ -0,0 +1,76 @@
+"""Индекс судов: кругорейсы и предрасчитанные итоги по каждому судну."""
+import numpy as np
+import pandas as pd
+
+# «Волгонефть (3)» — третий кругорейс судна «Волгонефть»
+VOYAGE_PATTERN = r'^(.*?)\s*\((\d+)\)\s*$'
+
+
+# Базовое название и номер кругорейса для массива уникальных названий
+def split_voyages(names):
+    stripped = pd.Series(names, dtype=object).fillna('').astype(str).str.strip()
+    parts = stripped.str.extract(VOYAGE_PATTERN)
+    base_names = parts[0].str.strip().fillna(stripped)
+    voyages = pd.to_numeric(parts[1]).fillna(0).astype(np.int64)
+    return base_names.to_numpy(dtype=object), voyages.to_numpy()
+
+
+class VesselIndex:
+    """Строится один раз на снимок журнала по принятым на пирс строкам.
+
+    Названия судов разбираются одним регулярным выражением по уникальным
+    значениям, базовые названия интернируются в целочисленные коды. Итоги по
+    судам и по кругорейсам считаются сразу, поэтому выборки по одному судну
+    не требуют повторного прохода по журналу.
+    """
+
+    def __init__(self, df):
+        arrived = df['дата_принятия_на_пирс'].notna().to_numpy()
+        name_codes, names = pd.factorize(df['судно'], use_na_sentinel=False)
+        base_of_name, voyage_of_name = split_voyages(np.asarray(names, dtype=object))
+        base_codes, self.base_names = pd.factorize(base_of_name)
+
+        name_codes = name_codes[arrived]
+        rows = pd.DataFrame({
+            'судно': base_codes[name_codes],
+            'кругорейс': voyage_of_name[name_codes],
+            'дата_принятия_на_пирс': df['дата_принятия_на_пирс'].to_numpy()[arrived],
+            'брутто': df['брутто'].to_numpy(dtype=np.float64)[arrived],
+        })
+
+        self.totals = self._vessel_totals(rows)
+        self.voyages = self._voyage_totals(rows)
+
+    def _vessel_totals(self, rows):
+        totals = rows.groupby('судно').agg(
+            количество_заходов=('дата_принятия_на_пирс', 'nunique'),
+            максимальный_кругорейс=('кругорейс', 'max'),
+            общий_тоннаж=('брутто', 'sum'),
+        )
+        totals.index = pd.Index(self.base_names[totals.index], name='судно')
+        return totals.sort_index()
+
+    def _voyage_totals(self, rows):
+        voyages = rows.groupby(['судно', 'кругорейс']).agg(
+            заходов=('дата_принятия_на_пирс', 'nunique'),
+            мест=('брутто', 'size'),
+            тоннаж=('брутто', 'sum'),
+            первое_принятие=('дата_принятия_на_пирс', 'min'),
+            последнее_принятие=('дата_принятия_на_пирс', 'max'),
+        )
+        voyages.index = pd.MultiIndex.from_arrays(
+            [self.base_names[voyages.index.get_level_values(0)], voyages.index.get_level_values(1)],
+            names=['судно', 'кругорейс'],
+        )
+        return voyages.sort_index()
+
+    # Суда с ненулевым тоннажем, по убыванию тоннажа
+    def stats(self):
+        stats = self.totals.reset_index()
+        return stats[stats['общий_тоннаж'] > 0].sort_values('общий_тоннаж', ascending=False)
+
+    # История кругорейсов одного судна
+    def voyage_history(self, name):
+        if name not in self.totals.index:
+            return self.voyages.iloc[:0].reset_index(level=0, drop=True)
+        return self.voyages.xs(name, level='судно')